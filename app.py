@@ -1,14 +1,18 @@
 from datetime import timedelta
 import os
-from flask import Flask, render_template, redirect, session
+from flask import Flask, render_template, redirect, session, jsonify
 from flask_cors import CORS
 from auth_utils import admin_required
+from routes.batch import InvalidBatch
+from routes.db import PoolTimeout
+from routes.pagination import InvalidCursor
+from services.metrics import init_metrics
 
 # -----------------------------
 # CREATE APP (FIRST!)
 # -----------------------------
 app = Flask(__name__, template_folder="templates")
-CORS(app, supports_credentials=True)
+CORS(app, supports_credentials=True, expose_headers=["X-Next-Cursor"])
 
 # -----------------------------
 # CONFIG
@@ -26,6 +30,21 @@ app.config.update(
     MAX_CONTENT_LENGTH=5 * 1024 * 1024
 )
 
+# Request timings + /metrics (Prometheus text format)
+init_metrics(app)
+
+@app.errorhandler(PoolTimeout)
+def db_pool_exhausted(e):
+    return jsonify({"error": "Server busy, please retry"}), 503
+
+@app.errorhandler(InvalidCursor)
+def invalid_cursor(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(InvalidBatch)
+def invalid_batch(e):
+    return jsonify({"error": str(e)}), 400
+
 # -----------------------------
 # HOME / STATIC PAGES
 # -----------------------------
@@ -25,9 +25,6 @@ from flask import session, redirect, request, jsonify
 def officer_required(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
-        print("DEBUG user_role =", session.get("user_role"))
-        print("DEBUG session =", dict(session))
-
         if session.get("user_role") != "officer":
             if request.headers.get("X-Requested-With") == "XMLHttpRequest":
                 return jsonify({"error": "Unauthorized"}), 401
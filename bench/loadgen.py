@@ -0,0 +1,353 @@
+import http.client
+import json
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from bench.seed import (
+    BENCH_PASSWORD, citizen_email, departments, make_photo, officer_email,
+    random_point
+)
+
+# -----------------------------
+# LOAD GENERATOR
+# -----------------------------
+# Closed loop: each virtual user logs in as one role and replays its
+# route mix. Latencies are grouped by route template.
+
+ADMIN_EMAIL = "admin@civicconnect.com"
+ADMIN_PASSWORD = "admin123"
+
+# Share of virtual users per role
+MIXES = {
+    "default": {"citizen": 0.6, "officer": 0.25, "admin": 0.15},
+    "citizen": {"citizen": 1.0},
+    "officer": {"officer": 1.0},
+    "admin": {"admin": 1.0},
+    "read": {"citizen": 0.4, "officer": 0.3, "admin": 0.3},
+}
+
+
+# -----------------------------
+# HTTP CLIENT
+# -----------------------------
+
+def encode_multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n".encode()
+        )
+    for name, (filename, data) in files.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+            f'filename="{filename}"\r\nContent-Type: image/jpeg\r\n\r\n'.encode()
+            + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+class Client:
+    # One keep-alive connection and cookie jar per virtual user
+
+    def __init__(self, base_url, timeout):
+        url = urlsplit(base_url)
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def request(self, method, path, form=None, files=None, params=None):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+
+        headers = {"X-Requested-With": "XMLHttpRequest"}
+        body = None
+        if files:
+            body, headers["Content-Type"] = encode_multipart(form or {}, files)
+        elif form is not None:
+            body = urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+
+        try:
+            conn = self._connection()
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+        for header in response.headers.get_all("Set-Cookie") or []:
+            name, _, rest = header.partition("=")
+            self.cookies[name.strip()] = rest.split(";", 1)[0]
+
+        return response.status, data
+
+
+# -----------------------------
+# SCENARIOS
+# -----------------------------
+# Every request goes through call(), which times it and records it under
+# its route template; multi-request flows record each step separately.
+
+class VirtualUser:
+    def __init__(self, client, role, index, rng, photos, recorder):
+        self.client = client
+        self.role = role
+        self.index = index
+        self.rng = rng
+        self.photos = photos
+        self.recorder = recorder
+        self.measuring = False
+
+    def call(self, route, method, path=None, **kwargs):
+        started = time.monotonic()
+        try:
+            status, body = self.client.request(method, path or route, **kwargs)
+        except (OSError, http.client.HTTPException):
+            if self.measuring:
+                self.recorder.error(route)
+            return None, b""
+        if self.measuring:
+            self.recorder.record(route, status, (time.monotonic() - started) * 1000)
+        return status, body
+
+    def login(self, citizens, officers):
+        if self.role == "admin":
+            email, password = ADMIN_EMAIL, ADMIN_PASSWORD
+        elif self.role == "officer":
+            depts = departments()
+            dept = depts[self.index % len(depts)]
+            email = officer_email(dept, (self.index // len(depts)) % officers)
+            password = BENCH_PASSWORD
+        else:
+            email, password = citizen_email(self.index % citizens), BENCH_PASSWORD
+
+        status, _ = self.client.request("POST", "/login", {"email": email, "password": password})
+        if status != 302:
+            raise RuntimeError(f"login as {email} failed with HTTP {status}")
+
+    def actions(self):
+        return {
+            "citizen": [
+                (3, self.predict_and_report),
+                (1, self.submit_issue),
+                (3, self.nearby),
+                (2, lambda: self.get("/user/issues")),
+                (2, lambda: self.get("/user/counts")),
+            ],
+            "officer": [
+                (4, lambda: self.get("/officer/issues")),
+                (2, lambda: self.get("/officer/issues/priority")),
+                (1, lambda: self.get("/officer/issues/rollup", {"granularity": "week"})),
+            ],
+            "admin": [
+                (3, lambda: self.get("/admin/issues/all")),
+                (3, lambda: self.get("/admin/stats")),
+                (1, lambda: self.get("/admin/count/pothole")),
+                (1, lambda: self.get("/admin/count/garbage")),
+                (1, lambda: self.get("/admin/count/general")),
+            ],
+        }[self.role]
+
+    def get(self, path, params=None):
+        self.call(path, "GET", params=params)
+
+    def nearby(self):
+        lat, lng = random_point(self.rng)
+        self.call("/issues/nearby", "GET", params={
+            "lat": lat, "lng": lng, "radius_m": self.rng.choice([500, 2000, 5000])
+        })
+
+    def _photo(self):
+        return self.rng.choice(self.photos)
+
+    def predict_and_report(self):
+        # The dashboard flow: classify first, then file with the prediction
+        photo = self._photo()
+        status, body = self.call(
+            "/predict", "POST", files={"image": ("photo.jpg", photo["data"])}
+        )
+        if status != 200:
+            return
+
+        prediction = json.loads(body)
+        self.call("/report-issue", "POST", form={
+            "predicted_issue": prediction["prediction"],
+            "confidence": prediction["confidence"],
+            "severity_score": prediction["severity_score"],
+            "description": "Load test report",
+            "location": "Bench street",
+            "lat": photo["lat"],
+            "lng": photo["lng"],
+        }, files={"photo_1": ("photo.jpg", photo["data"])})
+
+    def submit_issue(self):
+        photo = self._photo()
+        self.call("/submit-issue", "POST", form={
+            "description": "Load test report",
+            "location": "Bench street",
+            "lat": photo["lat"],
+            "lng": photo["lng"],
+        }, files={"photo_1": ("photo.jpg", photo["data"])})
+
+
+# -----------------------------
+# RECORDING
+# -----------------------------
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)     # route -> [ms]
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)         # route -> transport errors
+
+    def record(self, route, status, ms):
+        with self._lock:
+            self.latencies[route].append(ms)
+            self.statuses[route][status] += 1
+
+    def error(self, route):
+        with self._lock:
+            self.errors[route] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(recorder, elapsed):
+    routes = {}
+    total = []
+    for route in sorted(set(recorder.latencies) | set(recorder.errors)):
+        values = sorted(recorder.latencies.get(route, []))
+        total += values
+        statuses = recorder.statuses.get(route, {})
+        failed = sum(n for code, n in statuses.items() if code >= 400)
+        routes[route] = {
+            "requests": len(values),
+            "rps": round(len(values) / elapsed, 2),
+            "http_errors": failed,
+            "transport_errors": recorder.errors.get(route, 0),
+            "status": {str(code): n for code, n in sorted(statuses.items())},
+            "mean_ms": round(sum(values) / len(values), 2) if values else 0.0,
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "max_ms": round(values[-1], 2) if values else 0.0,
+        }
+
+    total.sort()
+    return {
+        "routes": routes,
+        "total": {
+            "requests": len(total),
+            "rps": round(len(total) / elapsed, 2),
+            "p50_ms": round(percentile(total, 50), 2),
+            "p95_ms": round(percentile(total, 95), 2),
+            "p99_ms": round(percentile(total, 99), 2),
+        },
+    }
+
+
+# -----------------------------
+# RUN
+# -----------------------------
+
+def make_photos(count, seed=7):
+    rng = random.Random(seed)
+    photos = []
+    for _ in range(count):
+        lat, lng = random_point(rng)
+        photos.append({"lat": lat, "lng": lng, "data": make_photo(rng, lat, lng)})
+    return photos
+
+
+def assign_roles(concurrency, mix):
+    roles = []
+    for role, share in MIXES[mix].items():
+        roles += [role] * round(concurrency * share)
+    # Rounding can leave us short or over: pad with / trim the largest role
+    largest = max(MIXES[mix], key=MIXES[mix].get)
+    while len(roles) < concurrency:
+        roles.append(largest)
+    return roles[:concurrency]
+
+
+def run_load(base_url, concurrency=16, duration=30, warmup=5, mix="default",
+             citizens=100, officers=2, photos=8, timeout=30, seed=1):
+    photo_pool = make_photos(photos, seed)
+    recorder = Recorder()
+    logged_in = threading.Barrier(concurrency + 1)
+    go = threading.Event()
+    clock = {}
+    failed_logins = []
+
+    def worker(index, role):
+        rng = random.Random(seed * 1000 + index)
+        client = Client(base_url, timeout)
+        user = VirtualUser(client, role, index, rng, photo_pool, recorder)
+        try:
+            user.login(citizens, officers)
+        except Exception as e:
+            failed_logins.append(f"{role}#{index}: {e}")
+            return
+        finally:
+            logged_in.wait()
+
+        go.wait()
+        actions = user.actions()
+        weights = [w for w, _ in actions]
+        while True:
+            now = time.monotonic()
+            if now >= clock["stop"]:
+                break
+            user.measuring = now >= clock["measure"]
+            rng.choices(actions, weights)[0][1]()
+        client.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(i, role), daemon=True)
+        for i, role in enumerate(assign_roles(concurrency, mix))
+    ]
+    for thread in threads:
+        thread.start()
+
+    # Everyone logs in first so logins aren't part of the measured window
+    logged_in.wait()
+    if failed_logins:
+        go.set()
+        raise RuntimeError("; ".join(failed_logins[:5]))
+
+    now = time.monotonic()
+    clock["measure"] = now + warmup
+    clock["stop"] = now + warmup + duration
+    go.set()
+    for thread in threads:
+        thread.join()
+
+    return summarize(recorder, duration)
@@ -0,0 +1,175 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from services.model_export import labelled_images, load_input
+from services.model_manager import backend_for, model_loader, read_metadata
+
+
+# -----------------------------
+# BACKEND COMPARISON
+# -----------------------------
+# Accuracy, agreement, latency and RSS per model file, each model in its
+# own process.
+#   python -m bench.model_backends --data dataset_holdout MODEL [MODEL ...]
+
+
+def rss_mb():
+    # Current resident set; falls back to the peak where /proc is missing
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# -----------------------------
+# ONE MODEL (child process)
+# -----------------------------
+
+def measure(path, data, limit, repeat, batch):
+    classes, version = read_metadata(path)
+    samples = labelled_images(data, classes, limit)
+    if not samples:
+        raise ValueError(f"no images under {data}")
+    inputs = np.stack([load_input(p) for p, _ in samples])
+    labels = np.array([label for _, label in samples])
+
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    model = model_loader()(path)
+    model.predict_on_batch(inputs[:1])      # warmup
+    load_s = time.perf_counter() - started
+    rss_loaded = rss_mb()
+
+    latencies = []
+    predictions = []
+    for _ in range(repeat):
+        predictions = []
+        for row in inputs:
+            started = time.perf_counter()
+            preds = model.predict_on_batch(row[np.newaxis])
+            latencies.append((time.perf_counter() - started) * 1000)
+            predictions.append(int(np.argmax(preds[0])))
+
+    result = {
+        "model": path,
+        "backend": backend_for(path),
+        "version": version,
+        "file_mb": round(os.path.getsize(path) / 1e6, 2),
+        "images": len(samples),
+        "accuracy": round(float(np.mean(np.array(predictions) == labels)), 4),
+        "predictions": predictions,
+        "load_s": round(load_s, 3),
+        "rss_before_mb": round(rss_before, 1),
+        "rss_loaded_mb": round(rss_loaded, 1),
+        "rss_peak_mb": round(peak_rss_mb(), 1),
+        "latencies_ms": latencies,
+    }
+
+    if batch > 1:
+        runs = []
+        for start in range(0, len(inputs) - batch + 1, batch):
+            chunk = inputs[start:start + batch]
+            started = time.perf_counter()
+            model.predict_on_batch(chunk)
+            runs.append(time.perf_counter() - started)
+        if runs:
+            result["batch"] = batch
+            result["batch_images_per_s"] = round(batch * len(runs) / sum(runs), 1)
+
+    return result
+
+
+def run_isolated(path, args):
+    output = subprocess.check_output([
+        sys.executable, "-m", "bench.model_backends", "--worker", path,
+        "--data", args.data, "--limit", str(args.limit),
+        "--repeat", str(args.repeat), "--batch", str(args.batch),
+    ])
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+# -----------------------------
+# REPORT
+# -----------------------------
+
+def print_summary(results, out=print):
+    out(f"{'model':<36}{'acc':>7}{'agree':>7}{'MB':>7}{'load s':>8}"
+        f"{'p50':>8}{'p95':>8}{'rss':>8}{'peak':>8}")
+    for r in results:
+        out(f"{os.path.basename(r['model']):<36}{r['accuracy']:>7}{r['agreement']:>7}"
+            f"{r['file_mb']:>7}{r['load_s']:>8}{r['p50_ms']:>8}{r['p95_ms']:>8}"
+            f"{r['rss_loaded_mb']:>8}{r['rss_peak_mb']:>8}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare classifier backends on a held-out image set")
+    parser.add_argument("models", nargs="*", help="first one is the reference for agreement")
+    parser.add_argument("--data", required=True, help="<class>/<image> folders not used in training")
+    parser.add_argument("--limit", type=int, default=0, help="max images (0: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the images")
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--label")
+    parser.add_argument("--out")
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.data, args.limit, args.repeat, args.batch)))
+        return 0
+
+    if not args.models:
+        parser.error("give at least one model")
+
+    # Imported here: the measuring child processes don't need the DB stack
+    from bench.loadgen import percentile
+    from bench.run import git_commit, save
+
+    results = [run_isolated(path, args) for path in args.models]
+    reference = np.array(results[0]["predictions"])
+    for r in results:
+        r["agreement"] = round(float(np.mean(np.array(r.pop("predictions")) == reference)), 4)
+        latencies = sorted(r.pop("latencies_ms"))
+        r["mean_ms"] = round(sum(latencies) / len(latencies), 3)
+        for pct in (50, 95, 99):
+            r[f"p{pct}_ms"] = round(percentile(latencies, pct), 3)
+
+    result = {
+        "meta": {
+            "label": args.label,
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "data": args.data,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "env": {k: os.environ[k] for k in ("TFLITE_THREADS",) if k in os.environ},
+        },
+        "models": results,
+    }
+
+    print_summary(results)
+    print(f"saved {save(result, args.out, args.label)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import argparse
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from services.preprocess import INPUT_SIZE, open_for_model, resize_for_model, to_input
+
+# -----------------------------
+# PREPROCESS BENCHMARK
+# -----------------------------
+# Full-resolution decode vs services.preprocess, on synthetic 12 MP JPEGs
+# or --images DIR: timings plus model input drift.
+
+PHONE_SIZE = (4032, 3024)
+
+
+def synthetic_photos(count, size=PHONE_SIZE, quality=90):
+    # Smooth gradients plus sensor-like noise: compresses and decodes like
+    # a real photo, unlike pure noise or a flat colour
+    photos = []
+    for i in range(count):
+        gradient = Image.linear_gradient("L").resize(size).rotate(i * 37, expand=False)
+        noise = Image.effect_noise(size, 24 + 8 * i)
+        channels = [
+            Image.blend(gradient, noise, 0.25 + 0.1 * c) for c in range(3)
+        ]
+        out = io.BytesIO()
+        Image.merge("RGB", channels).save(out, "JPEG", quality=quality)
+        photos.append(out.getvalue())
+    return photos
+
+
+def load_photos(folder):
+    photos = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith((".jpg", ".jpeg")):
+            with open(os.path.join(folder, name), "rb") as f:
+                photos.append(f.read())
+    return photos
+
+
+# -----------------------------
+# THE TWO PATHS
+# -----------------------------
+# Each returns (model input, decode seconds, preprocess seconds)
+
+def before(data):
+    started = time.perf_counter()
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    decoded = time.perf_counter()
+    arr = np.asarray(img.resize((INPUT_SIZE, INPUT_SIZE))) / 255.0
+    arr = arr.astype(np.float32)        # the cast the model did on every call
+    return arr, decoded - started, time.perf_counter() - decoded
+
+
+def after(data, out):
+    started = time.perf_counter()
+    img = open_for_model(data)
+    img.load()
+    decoded = time.perf_counter()
+    arr = to_input(resize_for_model(img), out)
+    return arr, decoded - started, time.perf_counter() - decoded
+
+
+# -----------------------------
+# REPORT
+# -----------------------------
+
+def stats(values):
+    values = sorted(v * 1000 for v in values)
+    return {
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(values[len(values) // 2], 2),
+        "p95": round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+    }
+
+
+def run(photos, repeat):
+    timings = {"before": ([], []), "after": ([], [])}
+    drift = []
+    buf = np.empty((INPUT_SIZE, INPUT_SIZE, 3), dtype=np.float32)
+
+    for _ in range(repeat):
+        for data in photos:
+            old, decode, prep = before(data)
+            timings["before"][0].append(decode)
+            timings["before"][1].append(prep)
+
+            new, decode, prep = after(data, buf)
+            timings["after"][0].append(decode)
+            timings["after"][1].append(prep)
+
+            drift.append(np.abs(old - new))
+
+    drift = np.stack(drift)
+    return {
+        path: {
+            "decode_ms": stats(decode),
+            "preprocess_ms": stats(prep),
+            "total_ms": stats([a + b for a, b in zip(decode, prep)]),
+        }
+        for path, (decode, prep) in timings.items()
+    }, {
+        "mean_abs": round(float(drift.mean()), 4),
+        "max_abs": round(float(drift.max()), 4),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the /predict decode + preprocessing path")
+    parser.add_argument("--images", help="folder of JPEGs (default: synthetic phone photos)")
+    parser.add_argument("--count", type=int, default=8, help="synthetic photos")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    photos = load_photos(args.images) if args.images else synthetic_photos(args.count)
+    if not photos:
+        parser.error(f"no JPEGs in {args.images}")
+
+    sizes = {Image.open(io.BytesIO(data)).size for data in photos}
+    print(f"{len(photos)} photos x {args.repeat}, sizes {sorted(sizes)[:3]}"
+          f"{'...' if len(sizes) > 3 else ''}")
+
+    results, drift = run(photos, args.repeat)
+
+    print(f"{'path':<10}{'stage':<14}{'mean':>9}{'p50':>9}{'p95':>9}")
+    for path, stages in results.items():
+        for stage, s in stages.items():
+            print(f"{path:<10}{stage[:-3]:<14}{s['mean']:>9}{s['p50']:>9}{s['p95']:>9}")
+
+    speedup = results["before"]["total_ms"]["mean"] / results["after"]["total_ms"]["mean"]
+    print(f"speedup {speedup:.1f}x, input drift mean {drift['mean_abs']} max {drift['max_abs']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+
+from bench.loadgen import MIXES, run_load
+
+# -----------------------------
+# LOAD TEST
+# -----------------------------
+# Migrate, seed, start the app on the stub model, replay the traffic mix
+# and save results. Use a throwaway DATABASE_URL.
+#   python -m bench.run --concurrency 32 --duration 60 --label baseline
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# App settings worth recording with every run, so results stay comparable
+RECORDED_ENV = [
+    "DB_POOL_MIN", "DB_POOL_MAX", "PREDICT_BATCH_WINDOW_MS", "PREDICT_MAX_BATCH",
+    "PREDICT_CACHE_SIZE", "IMAGE_MAX_DIM", "IMAGE_MAX_BYTES", "IMAGE_FORMAT",
+    "REPORT_ASYNC", "BENCH_STUB_INFER_MS",
+]
+
+
+# -----------------------------
+# APP SERVER
+# -----------------------------
+
+def start_server(port, workers, threads):
+    env = dict(os.environ, MODEL_PRELOAD="0", SECRET_KEY=os.getenv("SECRET_KEY", "bench"))
+    return subprocess.Popen([
+        sys.executable, "-m", "gunicorn",
+        "-w", str(workers), "--threads", str(threads),
+        "-b", f"127.0.0.1:{port}",
+        "--log-level", "warning",
+        "bench.stub_app:app",
+    ], env=env)
+
+
+def wait_ready(url, server=None, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"app server exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"{url}/", timeout=2):
+                return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+# -----------------------------
+# RESULTS
+# -----------------------------
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(result, out=None, label=None):
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        out = os.path.join(RESULTS_DIR, f"{stamp}{'-' + label if label else ''}.json")
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+    return out
+
+
+def print_summary(result, out=print):
+    out(f"{'route':<28}{'reqs':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}")
+    rows = list(result["routes"].items()) + [("TOTAL", result["total"])]
+    for route, r in rows:
+        errors = r.get("http_errors", 0) + r.get("transport_errors", 0)
+        out(f"{route:<28}{r['requests']:>8}{r['rps']:>9}"
+            f"{r['p50_ms']:>9}{r['p95_ms']:>9}{r['p99_ms']:>9}{errors:>8}")
+
+
+def _delta(old, new):
+    if not old:
+        return "    n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def compare(old, new, out=print):
+    # Latency deltas: negative is better. Throughput: positive is better.
+    out(f"{'route':<28}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    rows = sorted(set(old["routes"]) & set(new["routes"])) + ["TOTAL"]
+    for route in rows:
+        a = old["total"] if route == "TOTAL" else old["routes"][route]
+        b = new["total"] if route == "TOTAL" else new["routes"][route]
+        out(f"{route:<28}{_delta(a['rps'], b['rps']):>9}"
+            + "".join(f"{_delta(a[k], b[k]):>9}" for k in ("p50_ms", "p95_ms", "p99_ms")))
+    for route in sorted(set(old["routes"]) ^ set(new["routes"])):
+        out(f"{route:<28}  only in {'old' if route in old['routes'] else 'new'} run")
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test")
+    parser.add_argument("--url", help="benchmark an already running app instead of starting one")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds first")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--citizens", type=int, default=100)
+    parser.add_argument("--officers", type=int, default=2, help="per department")
+    parser.add_argument("--issues", type=int, default=10000)
+    parser.add_argument("--photos", type=int, default=8, help="distinct upload photos")
+    parser.add_argument("--no-seed", action="store_true", help="reuse an earlier seed")
+    parser.add_argument("--no-migrate", action="store_true")
+    parser.add_argument("--label")
+    parser.add_argument("--out")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f:
+            old = json.load(f)
+        with open(args.compare[1]) as f:
+            new = json.load(f)
+        compare(old, new)
+        return 0
+
+    server = None
+    url = args.url
+    if url is None:
+        if not args.no_migrate:
+            subprocess.check_call([sys.executable, "-m", "migrations.migrate"])
+        if not args.no_seed:
+            from bench.seed import seed
+            users, issues = seed(args.citizens, args.officers, args.issues)
+            print(f"seeded {users} users, {issues} issues")
+
+        url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args.port, args.workers, args.threads)
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    try:
+        wait_ready(url, server)
+        print(f"running {args.mix} mix: {args.concurrency} users, "
+              f"{args.warmup:g}s warmup + {args.duration:g}s against {url}")
+        summary = run_load(
+            url, concurrency=args.concurrency, duration=args.duration,
+            warmup=args.warmup, mix=args.mix, citizens=args.citizens,
+            officers=args.officers, photos=args.photos
+        )
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    result = {
+        "meta": {
+            "label": args.label,
+            "started_at": started_at,
+            "commit": git_commit(),
+            "url": url,
+            "mix": args.mix,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "workers": None if args.url else args.workers,
+            "threads": None if args.url else args.threads,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "env": {name: os.environ[name] for name in RECORDED_ENV if name in os.environ},
+        },
+        **summary,
+    }
+
+    print_summary(result)
+    print(f"saved {save(result, args.out, args.label)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
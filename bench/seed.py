@@ -0,0 +1,234 @@
+import argparse
+import io
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+import piexif
+from PIL import Image, ImageDraw
+from psycopg2.extras import execute_values
+from werkzeug.security import generate_password_hash
+
+from routes.counters import bump_counters, bump_tiles
+from routes.db import db_cursor
+from services.department_mapper import get_department
+from services.issue_versions import touch_all
+from utils.image_utils import store_image
+
+# -----------------------------
+# SEED DATA
+# -----------------------------
+# Seeded accounts use the @bench.local domain, so --reset removes them
+# (and their issues) without touching real data.
+#   python -m bench.seed --citizens 200 --issues 20000
+
+BENCH_DOMAIN = "bench.local"
+BENCH_PASSWORD = "bench-pass"
+
+# Centre of the synthetic city (Bengaluru) and its radius
+CITY_LAT = 12.9716
+CITY_LNG = 77.5946
+CITY_SPREAD_DEG = 0.09      # ~10 km
+
+ISSUE_TYPES = ["pothole", "garbage", "water"]
+STATUSES = ["Pending", "In Progress", "Resolved"]
+STATUS_WEIGHTS = [5, 3, 2]
+
+
+def citizen_email(i):
+    return f"citizen{i}@{BENCH_DOMAIN}"
+
+
+def officer_email(department, i):
+    return f"officer-{department.replace(' ', '-').lower()}-{i}@{BENCH_DOMAIN}"
+
+
+def departments():
+    return sorted({get_department(issue) for issue in ISSUE_TYPES})
+
+
+def random_point(rng):
+    return (
+        CITY_LAT + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG),
+        CITY_LNG + rng.uniform(-CITY_SPREAD_DEG, CITY_SPREAD_DEG),
+    )
+
+
+# -----------------------------
+# PHOTOS
+# -----------------------------
+
+def _dms(value):
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round(((value - degrees) * 60 - minutes) * 60 * 100)
+    return ((degrees, 1), (minutes, 1), (seconds, 100))
+
+
+def make_photo(rng, lat, lng, size=(1600, 1200), taken=None):
+    # A noisy "street photo" with GPS + capture time, so EXIF verification
+    # and the decode / resize paths do real work.
+    img = Image.effect_noise(size, rng.uniform(20, 80)).convert("RGB")
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse(
+            (x, y, x + rng.randrange(50, 400), y + rng.randrange(50, 300)),
+            fill=tuple(rng.randrange(256) for _ in range(3))
+        )
+
+    taken = taken or datetime.now()
+    exif = piexif.dump({
+        "0th": {},
+        "Exif": {piexif.ExifIFD.DateTimeOriginal: taken.strftime("%Y:%m:%d %H:%M:%S")},
+        "GPS": {
+            piexif.GPSIFD.GPSLatitudeRef: "N" if lat >= 0 else "S",
+            piexif.GPSIFD.GPSLatitude: _dms(lat),
+            piexif.GPSIFD.GPSLongitudeRef: "E" if lng >= 0 else "W",
+            piexif.GPSIFD.GPSLongitude: _dms(lng),
+        },
+    })
+
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=90, exif=exif)
+    return out.getvalue()
+
+
+# -----------------------------
+# SEED
+# -----------------------------
+
+def seed_users(cur, citizens, officers_per_department):
+    hashed = generate_password_hash(BENCH_PASSWORD)
+
+    rows = [
+        (f"Bench Citizen {i}", citizen_email(i), "9000000000", hashed,
+         "citizen", "560001", None, "active")
+        for i in range(citizens)
+    ]
+    for department in departments():
+        rows += [
+            (f"Bench Officer {department} {i}", officer_email(department, i),
+             "9000000000", hashed, "officer", None, department, "active")
+            for i in range(officers_per_department)
+        ]
+
+    # users.email has no unique constraint: skip accounts from earlier runs
+    execute_values(cur, """
+        INSERT INTO users
+            (name, email, phone, password, role, pincode, department, status)
+        SELECT * FROM (VALUES %s)
+            AS v (name, email, phone, password, role, pincode, department, status)
+        WHERE NOT EXISTS (SELECT 1 FROM users u WHERE u.email = v.email)
+    """, rows)
+    return len(rows)
+
+
+def seed_issues(cur, rng, issues, citizens, days, photos):
+    # Photos are stored once and shared between rows: the point is realistic
+    # table size, not unique files on disk.
+    stored = [
+        store_image(make_photo(rng, *random_point(rng)), "jpg")
+        for _ in range(photos)
+    ]
+
+    today = date.today()
+    rows = []
+    counts = Counter()
+    tiles = []
+    for _ in range(issues):
+        issue = rng.choice(ISSUE_TYPES)
+        status = rng.choices(STATUSES, STATUS_WEIGHTS)[0]
+        department = get_department(issue)
+        day = today - timedelta(days=rng.randrange(days))
+        created_at = datetime.combine(day, datetime.min.time()) + timedelta(
+            seconds=rng.randrange(86400)
+        )
+        lat, lng = random_point(rng)
+        confidence = rng.uniform(0.5, 1.0)
+        citizen = rng.randrange(citizens)
+
+        rows.append((
+            issue, confidence, round(confidence * 10, 2),
+            f"Synthetic {issue} report", f"Bench street {rng.randrange(500)}",
+            lat, lng, rng.choice(stored), None,
+            f"Bench Citizen {citizen}", citizen_email(citizen),
+            department, True, "Verified", status, created_at
+        ))
+        counts[(issue, status, department, day)] += 1
+        tiles.append((issue, status, lat, lng, 1))
+
+    execute_values(cur, """
+        INSERT INTO issues (
+            detected_issue, confidence, severity_score, description,
+            location_text, latitude, longitude, image1_path, image2_path,
+            citizen_name, citizen_email, assigned_department,
+            exif_verified, exif_reason, status, created_at
+        )
+        VALUES %s
+    """, rows, page_size=1000)
+
+    bump_counters(cur, [key + (count,) for key, count in counts.items()])
+    bump_tiles(cur, tiles)
+    touch_all(cur)
+
+    return len(rows)
+
+
+def reset(cur):
+    cur.execute("""
+        SELECT detected_issue, status, assigned_department,
+               created_at::date, COUNT(*)
+        FROM issues
+        WHERE citizen_email LIKE %s
+        GROUP BY 1, 2, 3, 4
+    """, (f"%@{BENCH_DOMAIN}",))
+    bump_counters(cur, [row[:4] + (-row[4],) for row in cur.fetchall()])
+
+    cur.execute("""
+        SELECT detected_issue, status, latitude, longitude
+        FROM issues
+        WHERE citizen_email LIKE %s
+    """, (f"%@{BENCH_DOMAIN}",))
+    bump_tiles(cur, [(issue, status, lat, lng, -1) for issue, status, lat, lng in cur.fetchall()])
+
+    cur.execute("DELETE FROM issues WHERE citizen_email LIKE %s", (f"%@{BENCH_DOMAIN}",))
+    issues = cur.rowcount
+    touch_all(cur)
+    cur.execute("DELETE FROM users WHERE email LIKE %s", (f"%@{BENCH_DOMAIN}",))
+    return issues, cur.rowcount
+
+
+def seed(citizens=100, officers=2, issues=10000, days=90, photos=20, seed=1):
+    rng = random.Random(seed)
+    with db_cursor(commit=True) as cur:
+        users = seed_users(cur, citizens, officers)
+        rows = seed_issues(cur, rng, issues, citizens, days, photos)
+    return users, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic users, issues and photos for load tests")
+    parser.add_argument("--citizens", type=int, default=100)
+    parser.add_argument("--officers", type=int, default=2, help="per department")
+    parser.add_argument("--issues", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=90, help="spread of created_at")
+    parser.add_argument("--photos", type=int, default=20, help="distinct stored photos")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--reset", action="store_true")
+    args = parser.parse_args()
+
+    if args.reset:
+        with db_cursor(commit=True) as cur:
+            issues, users = reset(cur)
+        print(f"removed {issues} issues, {users} users")
+        return
+
+    users, rows = seed(args.citizens, args.officers, args.issues,
+                       args.days, args.photos, args.seed)
+    print(f"seeded {users} users, {rows} issues")
+
+
+if __name__ == "__main__":
+    main()
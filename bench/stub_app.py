@@ -0,0 +1,47 @@
+import os
+import time
+
+import numpy as np
+
+import services.ml_model as ml_model
+from app import app  # noqa: F401
+from services.model_manager import read_metadata
+
+# -----------------------------
+# STUB APP
+# -----------------------------
+# The app with a cheap stand-in classifier, for load tests without
+# TensorFlow. BENCH_STUB_INFER_MS adds a fixed cost per batch.
+#   gunicorn -w 4 -b 127.0.0.1:5055 bench.stub_app:app
+
+BENCH_STUB_INFER_MS = float(os.getenv("BENCH_STUB_INFER_MS", "0"))
+
+
+class StubModel:
+    input_shape = (None, 224, 224, 3)
+
+    def __init__(self, classes):
+        self.output_shape = (None, len(classes))
+
+    def predict_on_batch(self, batch):
+        if BENCH_STUB_INFER_MS:
+            time.sleep(BENCH_STUB_INFER_MS / 1000)
+
+        # Deterministic per image: same photo, same class
+        batch = np.asarray(batch, dtype=np.float32)
+        means = batch.reshape(len(batch), -1, batch.shape[-1]).mean(axis=1)
+        logits = np.zeros((len(batch), self.output_shape[-1]), dtype=np.float32)
+        width = min(means.shape[-1], logits.shape[-1])
+        logits[:, :width] = means[:, :width] * 4
+        exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return exp / exp.sum(axis=1, keepdims=True)
+
+
+def stub_loader(path):
+    classes, _ = read_metadata(path)
+    return StubModel(classes)
+
+
+ml_model.models.loader = stub_loader
+# Loading the stub is instant: do it now so /predict/ready is green at boot
+ml_model.models.get()
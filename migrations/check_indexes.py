@@ -0,0 +1,113 @@
+import json
+import sys
+
+from routes.admin_routes import (
+    PENDING_OFFICERS_SQL, all_issues_query, all_officers_query,
+    all_users_query, issues_by_type_query, search_users_query
+)
+from routes.auth import USER_BY_EMAIL_SQL
+from routes.db import get_db
+from routes.nearbyissues import nearby_query
+from routes.officer_routes import officer_issues_query, priority_issues_query
+from routes.user_routes import user_counts_query, user_issues_query
+from services.dedup import DEDUP_MAX_RADIUS_M, candidates_query
+
+# -----------------------------
+# INDEX CHECK
+# -----------------------------
+# EXPLAINs each hot route query (built by the route's own code) against a
+# local migrated database, with seq scans off, and checks its index.
+#   python -m migrations.check_indexes
+
+LIMIT = 50
+# Sample keyset cursor and location
+CURSOR = ["2030-01-01", 1 << 30]
+LAT, LNG = 12.95, 77.55
+
+
+def limited(query, limit=LIMIT):
+    # Paged mode of the routes that also stream: the same SQL plus LIMIT
+    sql, params = query
+    return sql + " LIMIT %s", list(params) + [limit + 1]
+
+
+def route_checks():
+    # (route, (sql, params) built by the route's own code, expected index)
+    return [
+        ("/user/issues", user_issues_query("a@b.c", LIMIT, CURSOR),
+         "issues_citizen_created_idx"),
+        ("/user/issues (merged)", user_issues_query("a@b.c", LIMIT, CURSOR),
+         "issue_reports_citizen_idx"),
+        ("/user/counts", user_counts_query("a@b.c"),
+         "issues_citizen_created_idx"),
+        ("/officer/issues", officer_issues_query("sanitation", LIMIT, None),
+         "issues_dept_created_idx"),
+        ("/officer/issues/priority", priority_issues_query("road Maintenance", LIMIT, None),
+         "issues_dept_severity_idx"),
+        ("/admin/issues/<issue_type>", limited(issues_by_type_query("pothole", None)),
+         "issues_type_created_idx"),
+        ("/admin/issues/all", limited(all_issues_query(None)),
+         "issues_created_idx"),
+        ("/issues/nearby", limited(nearby_query(LAT, LNG, 5000)),
+         "issues_lat_lng_idx"),
+        ("/report-issue (dedup)", candidates_query("pothole", LAT, LNG, DEDUP_MAX_RADIUS_M),
+         "issues_type_cell_open_idx"),
+        ("/login", (USER_BY_EMAIL_SQL, ("a@b.c",)),
+         "users_email_idx"),
+        ("/admin/officers/pending", (PENDING_OFFICERS_SQL, ()),
+         "users_role_status_idx"),
+        ("/admin/officers/all", limited(all_officers_query(None)),
+         "users_officers_id_idx"),
+        ("/admin/users/all", limited(all_users_query(None)),
+         "users_citizens_id_idx"),
+        ("/admin/users/search (3+ chars)",
+         search_users_query("citizen", "id, name, email", "ravi", "all", 20),
+         "users_name_trgm_gist_idx"),
+        ("/admin/users/search (3+ chars)",
+         search_users_query("citizen", "id, name, email", "ravi", "all", 20),
+         "users_email_trgm_gist_idx"),
+        ("/admin/users/search (prefix)",
+         search_users_query("citizen", "id, name, email", "ra", "all", 20),
+         "users_name_prefix_idx"),
+    ]
+
+
+def plan_indexes(plan):
+    found = set()
+    if "Index Name" in plan:
+        found.add(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found |= plan_indexes(child)
+    return found
+
+
+def run_checks(db, checks=None, out=print):
+    failures = 0
+    with db.cursor() as cur:
+        cur.execute("SET enable_seqscan = off")
+        for route, (sql, params), expected in checks or route_checks():
+            cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+            plan = cur.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+
+            used = plan_indexes(plan[0]["Plan"])
+            ok = expected in used
+            failures += not ok
+            out(f"{'ok  ' if ok else 'FAIL'} {route:<28} {expected}"
+                + ("" if ok else f"  (plan used: {', '.join(sorted(used)) or 'no index'})"))
+    db.rollback()
+    return failures
+
+
+def main():
+    db = get_db()
+    try:
+        failures = run_checks(db)
+    finally:
+        db.close()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
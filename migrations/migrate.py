@@ -0,0 +1,179 @@
+import hashlib
+import os
+import re
+import sys
+
+from routes.db import get_db
+
+# -----------------------------
+# SCHEMA MIGRATIONS
+# -----------------------------
+# Forward-only: versions/NNNN_name.sql in order, recorded in
+# schema_migrations. "-- migrate: no-transaction" files run in autocommit.
+#   python -m migrations.migrate [--status]
+
+VERSIONS_DIR = os.path.join(os.path.dirname(__file__), "versions")
+NO_TRANSACTION = "-- migrate: no-transaction"
+
+# Any fixed key: keeps two deploys from migrating at the same time
+LOCK_KEY = 7241001
+
+CREATE_INDEX_CONCURRENTLY = re.compile(
+    r"^CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)",
+    re.I
+)
+
+
+class MigrationError(Exception):
+    pass
+
+
+def load_migrations():
+    migrations = []
+    for filename in sorted(os.listdir(VERSIONS_DIR)):
+        match = re.match(r"^(\d+)_(\w+)\.sql$", filename)
+        if not match:
+            continue
+        with open(os.path.join(VERSIONS_DIR, filename)) as f:
+            sql = f.read()
+        migrations.append({
+            "version": int(match.group(1)),
+            "name": match.group(2),
+            "sql": sql,
+            "checksum": hashlib.sha256(sql.encode()).hexdigest(),
+            "transactional": not sql.lstrip().startswith(NO_TRANSACTION),
+        })
+    return migrations
+
+
+def split_statements(sql):
+    # Our migration files contain no functions or quoted semicolons, so a
+    # statement ends at a semicolon that closes a line.
+    body = "\n".join(
+        line for line in sql.splitlines() if not line.strip().startswith("--")
+    )
+    return [stmt.strip() for stmt in re.split(r";\s*$", body, flags=re.M) if stmt.strip()]
+
+
+def ensure_table(db):
+    with db.cursor() as cur:
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version    INTEGER PRIMARY KEY,
+                name       TEXT NOT NULL,
+                checksum   TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        """)
+    db.commit()
+
+
+def applied_versions(db):
+    with db.cursor() as cur:
+        cur.execute("SELECT version, checksum FROM schema_migrations")
+        return dict(cur.fetchall())
+
+
+def apply(db, migration):
+    if migration["transactional"]:
+        with db.cursor() as cur:
+            cur.execute(migration["sql"])
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration["version"], migration["name"], migration["checksum"])
+            )
+        db.commit()
+        return
+
+    db.autocommit = True
+    try:
+        with db.cursor() as cur:
+            for statement in split_statements(migration["sql"]):
+                run_concurrent_statement(cur, statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                (migration["version"], migration["name"], migration["checksum"])
+            )
+    finally:
+        db.autocommit = False
+
+
+def index_valid(cur, name):
+    # None when there is no such index
+    cur.execute("""
+        SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)
+    """, (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def run_concurrent_statement(cur, statement):
+    # An interrupted CREATE INDEX CONCURRENTLY leaves an INVALID index
+    # behind, which IF NOT EXISTS then skips: rebuild it, and never record
+    # the migration while one of its indexes is unusable.
+    match = CREATE_INDEX_CONCURRENTLY.match(statement)
+    if not match:
+        cur.execute(statement)
+        return
+
+    name = match.group(1)
+    if index_valid(cur, name) is False:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cur.execute(statement)
+    if not index_valid(cur, name):
+        raise MigrationError(f"index {name} is not valid after CREATE INDEX CONCURRENTLY")
+
+
+def migrate(db, status_only=False, out=print):
+    ensure_table(db)
+    migrations = load_migrations()
+
+    with db.cursor() as cur:
+        cur.execute("SELECT pg_advisory_lock(%s)", (LOCK_KEY,))
+    db.commit()
+
+    try:
+        applied = applied_versions(db)
+
+        for migration in migrations:
+            label = f"{migration['version']:04d}_{migration['name']}"
+            done = applied.get(migration["version"])
+
+            if done is not None:
+                if done != migration["checksum"]:
+                    raise MigrationError(f"{label} was edited after it was applied")
+                if status_only:
+                    out(f"applied  {label}")
+                continue
+
+            if status_only:
+                out(f"pending  {label}")
+                continue
+
+            out(f"applying {label} ...")
+            try:
+                apply(db, migration)
+            except Exception:
+                db.rollback()
+                raise
+            out(f"applied  {label}")
+    finally:
+        with db.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (LOCK_KEY,))
+        db.commit()
+
+
+def main(argv):
+    db = get_db()
+    try:
+        migrate(db, status_only="--status" in argv)
+    except MigrationError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,23 @@
+-- Incrementally maintained issue counts (detected_issue x status x department).
+-- Kept in step with `issues` by routes/counters.py inside the same
+-- transaction as every insert, delete and status change.
+
+CREATE TABLE IF NOT EXISTS issue_counters (
+    detected_issue      TEXT    NOT NULL,
+    status              TEXT    NOT NULL,
+    assigned_department TEXT    NOT NULL,
+    count               BIGINT  NOT NULL DEFAULT 0,
+    PRIMARY KEY (detected_issue, status, assigned_department)
+);
+
+-- One-off backfill from existing rows
+INSERT INTO issue_counters (detected_issue, status, assigned_department, count)
+SELECT
+    COALESCE(detected_issue, 'unknown'),
+    COALESCE(status, 'unknown'),
+    COALESCE(assigned_department, 'unknown'),
+    COUNT(*)
+FROM issues
+GROUP BY 1, 2, 3
+ON CONFLICT (detected_issue, status, assigned_department)
+DO UPDATE SET count = EXCLUDED.count;
@@ -0,0 +1,27 @@
+-- Per-day issue counts by department, type and current status.
+-- Bucketed on the issue's created_at date; week/month views are summed
+-- from these rows, so their cost depends on the number of days, not issues.
+-- Maintained by routes/counters.py alongside issue_counters.
+
+CREATE TABLE IF NOT EXISTS issue_daily_rollups (
+    day                 DATE    NOT NULL,
+    assigned_department TEXT    NOT NULL,
+    detected_issue      TEXT    NOT NULL,
+    status              TEXT    NOT NULL,
+    count               BIGINT  NOT NULL DEFAULT 0,
+    PRIMARY KEY (assigned_department, day, detected_issue, status)
+);
+
+-- One-off backfill from existing rows
+INSERT INTO issue_daily_rollups
+    (day, assigned_department, detected_issue, status, count)
+SELECT
+    created_at::date,
+    COALESCE(assigned_department, 'unknown'),
+    COALESCE(detected_issue, 'unknown'),
+    COALESCE(status, 'unknown'),
+    COUNT(*)
+FROM issues
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (assigned_department, day, detected_issue, status)
+DO UPDATE SET count = EXCLUDED.count;
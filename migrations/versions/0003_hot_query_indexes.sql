@@ -0,0 +1,47 @@
+-- migrate: no-transaction
+-- Indexes for the hot queries in routes/*.py. Built CONCURRENTLY so a
+-- deploy never locks `issues` or `users` against writes.
+-- migrations/check_indexes.py verifies each route's plan uses its index.
+
+-- /user/issues (keyset on created_at, issue_id) and /user/counts
+-- (status INCLUDEd so the per-citizen counts are index-only)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issues_citizen_created_idx
+    ON issues (citizen_email, created_at DESC, issue_id DESC)
+    INCLUDE (status);
+
+-- /officer/issues
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issues_dept_created_idx
+    ON issues (assigned_department, created_at DESC, issue_id DESC);
+
+-- /officer/issues/priority
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issues_dept_severity_idx
+    ON issues (assigned_department, (COALESCE(severity_score, 0)) DESC, issue_id DESC);
+
+-- /admin/issues/<issue_type>
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issues_type_created_idx
+    ON issues (detected_issue, created_at DESC, issue_id DESC);
+
+-- /admin/issues/all and the streamed export
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issues_created_idx
+    ON issues (created_at DESC, issue_id DESC);
+
+-- /issues/nearby bounding-box prefilter
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issues_lat_lng_idx
+    ON issues (latitude, longitude);
+
+-- /login, /signup duplicate check, officer/admin issue detail joins
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_idx
+    ON users (email);
+
+-- /admin/officers/pending, /admin/officers/blocked, status-filtered search
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_role_status_idx
+    ON users (role, status, id DESC);
+
+-- /admin/officers/all and /admin/users/all (keyset on id per role)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_officers_id_idx
+    ON users (id DESC)
+    WHERE role = 'officer';
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_citizens_id_idx
+    ON users (id DESC)
+    WHERE role = 'citizen';
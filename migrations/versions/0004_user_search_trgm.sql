@@ -0,0 +1,18 @@
+-- migrate: no-transaction
+-- Search-as-you-type for /admin/officers/search and /admin/users/search.
+-- Trigram GIN indexes serve the substring match (3+ characters);
+-- lower(...) text_pattern_ops btrees serve short prefix queries.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_name_trgm_idx
+    ON users USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_trgm_idx
+    ON users USING gin (email gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_name_prefix_idx
+    ON users (lower(name) text_pattern_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_prefix_idx
+    ON users (lower(email) text_pattern_ops);
@@ -0,0 +1,21 @@
+-- Durable queue for asynchronous /report-issue ingestion.
+-- Uploads are spooled to disk; rows carry the form fields and progress.
+
+CREATE TABLE IF NOT EXISTS report_jobs (
+    job_id        TEXT        PRIMARY KEY,
+    status        TEXT        NOT NULL DEFAULT 'queued',   -- queued | processing | done | failed
+    stage         TEXT        NOT NULL DEFAULT 'queued',
+    payload       JSONB       NOT NULL,
+    result        JSONB,
+    error         TEXT,
+    attempts      INTEGER     NOT NULL DEFAULT 0,
+    citizen_email TEXT,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at    TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    locked_at     TIMESTAMPTZ
+);
+
+-- Workers claim the oldest runnable job with FOR UPDATE SKIP LOCKED
+CREATE INDEX IF NOT EXISTS report_jobs_runnable_idx
+    ON report_jobs (created_at)
+    WHERE status IN ('queued', 'processing');
@@ -0,0 +1,40 @@
+-- migrate: no-transaction
+-- Near-duplicate detection at submission time (services/dedup.py).
+-- Every statement is idempotent, so a failed run can simply be re-run.
+
+-- Grid cell of (latitude, longitude): same formula as utils/geo_utils.grid_cell
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS grid_cell BIGINT;
+
+-- 64-bit dHash of photo 1, stored signed
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS image_phash BIGINT;
+
+-- "+1" reports merged into this issue
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS duplicate_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS issue_reports (
+    report_id      BIGSERIAL   PRIMARY KEY,
+    issue_id       INTEGER     NOT NULL REFERENCES issues (issue_id) ON DELETE CASCADE,
+    citizen_name   TEXT,
+    citizen_email  TEXT,
+    description    TEXT,
+    latitude       DOUBLE PRECISION,
+    longitude      DOUBLE PRECISION,
+    image1_path    TEXT,
+    image2_path    TEXT,
+    distance_m     REAL,
+    phash_distance SMALLINT,
+    created_at     TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issue_reports_issue_idx
+    ON issue_reports (issue_id);
+
+UPDATE issues
+SET grid_cell = (floor(latitude::float8 / 0.001)::bigint + 90000) * 360001
+              + (floor(longitude::float8 / 0.001)::bigint + 180000)
+WHERE grid_cell IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL;
+
+-- Dedup lookup: open issues of one type in a handful of cells
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issues_type_cell_open_idx
+    ON issues (detected_issue, grid_cell)
+    WHERE status <> 'Resolved';
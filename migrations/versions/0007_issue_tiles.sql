@@ -0,0 +1,15 @@
+-- Geohash tile aggregates for /issues/tiles/<z>/<x>/<y>, maintained by
+-- routes/counters.bump_tiles on every issue insert, delete and status change.
+-- Geohashes can't be computed in plain SQL, so fill it once after applying:
+--     python -m routes.counters --rebuild-tiles
+
+CREATE TABLE IF NOT EXISTS issue_tiles (
+    precision      SMALLINT         NOT NULL,
+    geohash        TEXT             NOT NULL,
+    detected_issue TEXT             NOT NULL,
+    status         TEXT             NOT NULL,
+    count          INTEGER          NOT NULL DEFAULT 0,
+    sum_lat        DOUBLE PRECISION NOT NULL DEFAULT 0,
+    sum_lng        DOUBLE PRECISION NOT NULL DEFAULT 0,
+    PRIMARY KEY (precision, geohash, detected_issue, status)
+);
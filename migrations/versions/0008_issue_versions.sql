@@ -0,0 +1,5 @@
+-- Version numbers behind the issue ETags (services/issue_versions.py).
+-- Every write to an issue takes nextval() and NOTIFYs issue_changed with
+-- "<issue_id>:<version>"; workers LISTEN and answer If-None-Match from memory.
+
+CREATE SEQUENCE IF NOT EXISTS issue_version_seq;
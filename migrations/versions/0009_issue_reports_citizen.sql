@@ -0,0 +1,6 @@
+-- migrate: no-transaction
+-- Citizens see the complaints they were merged into (issue_reports) next to
+-- their own in /user/issues, /user/issue/<id> and /user/counts.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS issue_reports_citizen_idx
+    ON issue_reports (citizen_email, issue_id);
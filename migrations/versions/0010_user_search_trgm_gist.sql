@@ -0,0 +1,15 @@
+-- migrate: no-transaction
+-- Trigram GiST instead of GIN for /admin/officers/search and
+-- /admin/users/search: GiST also orders by word distance (<<->), so each
+-- search walks the index nearest-first and stops at its LIMIT instead of
+-- ranking every substring match. It serves the ILIKE filter as well.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_name_trgm_gist_idx
+    ON users USING gist (name gist_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_email_trgm_gist_idx
+    ON users USING gist (email gist_trgm_ops);
+
+DROP INDEX CONCURRENTLY IF EXISTS users_name_trgm_idx;
+
+DROP INDEX CONCURRENTLY IF EXISTS users_email_trgm_idx;
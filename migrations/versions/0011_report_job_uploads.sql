@@ -0,0 +1,11 @@
+-- Uploads of queued /report-issue jobs, kept in the database instead of a
+-- node-local spool directory so any web node's workers can run any job.
+-- Rows go when the job completes or fails for good.
+
+CREATE TABLE IF NOT EXISTS report_job_uploads (
+    job_id  TEXT  NOT NULL REFERENCES report_jobs (job_id) ON DELETE CASCADE,
+    field   TEXT  NOT NULL,     -- photo_1 | photo_2
+    ext     TEXT  NOT NULL,
+    data    BYTEA NOT NULL,
+    PRIMARY KEY (job_id, field)
+);
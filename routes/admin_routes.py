@@ -1,6 +1,11 @@
 from flask import Blueprint, request, jsonify
 from auth_utils import admin_required
-from routes.db import get_db
+from routes.batch import USER_STATUSES, batch_args, batch_result
+from routes.counters import read_counters
+from routes.db import db_cursor, pool_stats, stream_rows
+from routes.pagination import page_args, keyset_after, paginate, paged_response
+from routes.streaming import stream_format, streamed_response
+from utils.image_utils import get_ingest_stats
 from psycopg2.extras import RealDictCursor
 
 admin_bp = Blueprint(
@@ -12,22 +17,23 @@ admin_bp = Blueprint(
 # -----------------------------
 # Admin Pending / Approve / Reject
 # -----------------------------
+# Listing SQL lives in constants and *_query(...) -> (sql, params)
+# builders so migrations/check_indexes.py EXPLAINs what the routes run.
+
+PENDING_OFFICERS_SQL = """
+    SELECT id, name, email, department
+    FROM users
+    WHERE role='officer' AND status='pending'
+"""
+
 
 @admin_bp.route("/officers/pending")
 @admin_required
 def get_pending_officers():
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(PENDING_OFFICERS_SQL)
 
-    cur.execute("""
-        SELECT id, name, email, department
-        FROM users
-        WHERE role='officer' AND status='pending'
-    """)
-
-    officers = cur.fetchall()
-    cur.close()
-    db.close()
+        officers = cur.fetchall()
 
     return jsonify(officers)
 
@@ -37,18 +43,12 @@ def get_pending_officers():
 def approve_officer():
     officer_id = request.form.get("officer_id")
 
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        UPDATE users
-        SET status='active'
-        WHERE id=%s AND role='officer'
-    """, (officer_id,))
-
-    db.commit()
-    cur.close()
-    db.close()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE users
+            SET status='active'
+            WHERE id=%s AND role='officer'
+        """, (officer_id,))
 
     return jsonify(success=True)
 
@@ -58,18 +58,12 @@ def approve_officer():
 def reject_officer():
     officer_id = request.form.get("officer_id")
 
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        UPDATE users
-        SET status='blocked'
-        WHERE id=%s AND role='officer'
-    """, (officer_id,))
-
-    db.commit()
-    cur.close()
-    db.close()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE users
+            SET status='blocked'
+            WHERE id=%s AND role='officer'
+        """, (officer_id,))
 
     return jsonify(success=True)
 
@@ -77,18 +71,14 @@ def reject_officer():
 @admin_bp.route("/officers/blocked")
 @admin_required
 def get_blocked_officers():
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("""
-        SELECT id, name, email, department
-        FROM users
-        WHERE role='officer' AND status='blocked'
-    """)
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute("""
+            SELECT id, name, email, department
+            FROM users
+            WHERE role='officer' AND status='blocked'
+        """)
 
-    officers = cur.fetchall()
-    cur.close()
-    db.close()
+        officers = cur.fetchall()
 
     return jsonify(officers)
 
@@ -98,29 +88,20 @@ def get_blocked_officers():
 def reactivate_officer():
     officer_id = request.form.get("officer_id")
 
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        UPDATE users
-        SET status='active'
-        WHERE id=%s AND role='officer'
-    """, (officer_id,))
-
-    db.commit()
-    cur.close()
-    db.close()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE users
+            SET status='active'
+            WHERE id=%s AND role='officer'
+        """, (officer_id,))
 
     return jsonify(success=True)
 
 
-@admin_bp.route("/issues/all")
-@admin_required
-def get_all_issues():
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("""
+def all_issues_query(cursor):
+    # No LIMIT: the export streams everything after the cursor
+    after, params = keyset_after(["created_at", "issue_id"], cursor)
+    return f"""
         SELECT
             issue_id,
             detected_issue,
@@ -130,83 +111,100 @@ def get_all_issues():
             citizen_name,
             citizen_email
         FROM issues
-        ORDER BY created_at DESC
-    """)
+        WHERE {after}
+        ORDER BY created_at DESC, issue_id DESC
+    """, params
+
+
+@admin_bp.route("/issues/all")
+@admin_required
+def get_all_issues():
+    limit, cursor = page_args()
+    sql, params = all_issues_query(cursor)
+
+    # Full export: everything after the cursor, streamed in batches
+    fmt = stream_format()
+    if fmt:
+        return streamed_response(stream_rows(sql, params, RealDictCursor), fmt)
+
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(sql + " LIMIT %s", params + [limit + 1])
+        issues = cur.fetchall()
+
+    issues, next_cursor = paginate(
+        issues, limit, lambda i: (i["created_at"], i["issue_id"])
+    )
+    return paged_response(issues, next_cursor)
 
-    issues = cur.fetchall()
-    cur.close()
-    db.close()
 
-    return jsonify(issues)
+def issues_by_type_query(issue_type, cursor):
+    after, params = keyset_after(["created_at", "issue_id"], cursor)
+
+    if issue_type != "all":
+        after = "detected_issue=%s AND " + after
+        params = [issue_type] + params
+
+    return f"""
+        SELECT
+            issue_id,
+            detected_issue,
+            status,
+            location_text,
+            created_at
+        FROM issues
+        WHERE {after}
+        ORDER BY created_at DESC, issue_id DESC
+    """, params
 
 
 @admin_bp.route("/issues/<issue_type>")
 @admin_required
 def get_issues_by_type(issue_type):
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+    limit, cursor = page_args()
+    sql, params = issues_by_type_query(issue_type, cursor)
 
-    if issue_type == "all":
-        cur.execute("""
-            SELECT
-                issue_id,
-                detected_issue,
-                status,
-                location_text,
-                created_at
-            FROM issues
-            ORDER BY created_at DESC
-        """)
-    else:
-        cur.execute("""
-            SELECT
-                issue_id,
-                detected_issue,
-                status,
-                location_text,
-                created_at
-            FROM issues
-            WHERE detected_issue=%s
-            ORDER BY created_at DESC
-        """, (issue_type,))
+    fmt = stream_format()
+    if fmt:
+        return streamed_response(stream_rows(sql, params, RealDictCursor), fmt)
 
-    issues = cur.fetchall()
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(sql + " LIMIT %s", params + [limit + 1])
+        issues = cur.fetchall()
 
-    return jsonify(issues)
+    issues, next_cursor = paginate(
+        issues, limit, lambda i: (i["created_at"], i["issue_id"])
+    )
+    return paged_response(issues, next_cursor)
 
 
 @admin_bp.route("/issue/<int:issue_id>")
 @admin_required
 def admin_issue_details(issue_id):
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("""
-        SELECT
-            i.issue_id,
-            i.detected_issue,
-            i.status,
-            i.description,
-            i.location_text,
-            i.created_at,
-            i.image1_path,
-            i.assigned_department,
-            i.citizen_name,
-            i.citizen_email,
-            u.phone AS citizen_phone,
-            i.confidence,
-            i.severity_score
-        FROM issues i
-        LEFT JOIN users u
-            ON i.citizen_email = u.email
-        WHERE i.issue_id = %s
-    """, (issue_id,))
-
-    issue = cur.fetchone()
-    cur.close()
-    db.close()
+    # No ETag here: citizen_phone comes from users, which issue versions
+    # don't track
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute("""
+            SELECT
+                i.issue_id,
+                i.detected_issue,
+                i.status,
+                i.description,
+                i.location_text,
+                i.created_at,
+                i.image1_path,
+                i.assigned_department,
+                i.citizen_name,
+                i.citizen_email,
+                u.phone AS citizen_phone,
+                i.confidence,
+                i.severity_score
+            FROM issues i
+            LEFT JOIN users u
+                ON i.citizen_email = u.email
+            WHERE i.issue_id = %s
+        """, (issue_id,))
+
+        issue = cur.fetchone()
 
     if not issue:
         return jsonify({"error": "Complaint not found"}), 404
@@ -214,24 +212,32 @@ def admin_issue_details(issue_id):
     return jsonify(issue)
 
 
+def all_officers_query(cursor):
+    after, params = keyset_after(["id"], cursor)
+    return f"""
+        SELECT id, name, email, department, status
+        FROM users
+        WHERE role='officer' AND {after}
+        ORDER BY id DESC
+    """, params
+
+
 @admin_bp.route("/officers/all")
 @admin_required
 def get_all_officers():
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+    limit, cursor = page_args()
+    sql, params = all_officers_query(cursor)
 
-    cur.execute("""
-        SELECT id, name, email, department, status
-        FROM users
-        WHERE role='officer'
-        ORDER BY id DESC
-    """)
+    fmt = stream_format()
+    if fmt:
+        return streamed_response(stream_rows(sql, params, RealDictCursor), fmt)
 
-    officers = cur.fetchall()
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(sql + " LIMIT %s", params + [limit + 1])
+        officers = cur.fetchall()
 
-    return jsonify(officers)
+    officers, next_cursor = paginate(officers, limit, lambda o: (o["id"],))
+    return paged_response(officers, next_cursor)
 
 
 @admin_bp.route("/block-officer", methods=["POST"])
@@ -239,40 +245,42 @@ def get_all_officers():
 def block_officer():
     officer_id = request.form.get("officer_id")
 
-    db = get_db()
-    cur = db.cursor()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE users
+            SET status='blocked'
+            WHERE id=%s AND role='officer'
+        """, (officer_id,))
 
-    cur.execute("""
-        UPDATE users
-        SET status='blocked'
-        WHERE id=%s AND role='officer'
-    """, (officer_id,))
+    return jsonify(success=True)
 
-    db.commit()
-    cur.close()
-    db.close()
 
-    return jsonify(success=True)
+def all_users_query(cursor):
+    after, params = keyset_after(["id"], cursor)
+    return f"""
+        SELECT id, name, email, phone, pincode, status
+        FROM users
+        WHERE role='citizen' AND {after}
+        ORDER BY id DESC
+    """, params
 
 
 @admin_bp.route("/users/all")
 @admin_required
 def get_all_users():
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+    limit, cursor = page_args()
+    sql, params = all_users_query(cursor)
 
-    cur.execute("""
-        SELECT id, name, email, phone, pincode, status
-        FROM users
-        WHERE role='citizen'
-        ORDER BY id DESC
-    """)
+    fmt = stream_format()
+    if fmt:
+        return streamed_response(stream_rows(sql, params, RealDictCursor), fmt)
 
-    users = cur.fetchall()
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(sql + " LIMIT %s", params + [limit + 1])
+        users = cur.fetchall()
 
-    return jsonify(users)
+    users, next_cursor = paginate(users, limit, lambda u: (u["id"],))
+    return paged_response(users, next_cursor)
 
 
 @admin_bp.route("/block-user", methods=["POST"])
@@ -280,18 +288,12 @@ def get_all_users():
 def block_user():
     user_id = request.form.get("user_id")
 
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        UPDATE users
-        SET status='blocked'
-        WHERE id=%s AND role='citizen'
-    """, (user_id,))
-
-    db.commit()
-    cur.close()
-    db.close()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE users
+            SET status='blocked'
+            WHERE id=%s AND role='citizen'
+        """, (user_id,))
 
     return jsonify(success=True)
 
@@ -301,150 +303,251 @@ def block_user():
 def reactivate_user():
     user_id = request.form.get("user_id")
 
-    db = get_db()
-    cur = db.cursor()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE users
+            SET status='active'
+            WHERE id=%s AND role='citizen'
+        """, (user_id,))
 
-    cur.execute("""
-        UPDATE users
-        SET status='active'
-        WHERE id=%s AND role='citizen'
-    """, (user_id,))
+    return jsonify(success=True)
 
-    db.commit()
-    cur.close()
-    db.close()
 
-    return jsonify(success=True)
+# -----------------------------
+# BATCH MODERATION
+# -----------------------------
+# approve / reactivate = "active", reject / block = "blocked", for up to
+# MAX_BATCH_IDS accounts in one transaction.
 
+def _batch_user_status(role):
+    user_ids, status = batch_args(USER_STATUSES)
 
-@admin_bp.route("/officers/search")
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            SELECT id, status
+            FROM users
+            WHERE id = ANY(%s) AND role = %s
+            ORDER BY id
+            FOR UPDATE
+        """, (user_ids, role))
+        current = dict(cur.fetchall())
+
+        unchanged = {i for i, old in current.items() if old == status}
+        to_update = sorted(set(current) - unchanged)
+
+        updated = set()
+        if to_update:
+            cur.execute("""
+                UPDATE users
+                SET status = %s
+                WHERE id = ANY(%s)
+                RETURNING id
+            """, (status, to_update))
+            updated = {row[0] for row in cur.fetchall()}
+
+    return jsonify(batch_result(user_ids, status, updated, unchanged))
+
+
+@admin_bp.route("/officers/batch-status", methods=["POST"])
 @admin_required
-def search_officers():
+def batch_officer_status():
+    return _batch_user_status("officer")
+
+
+@admin_bp.route("/users/batch-status", methods=["POST"])
+@admin_required
+def batch_user_status():
+    return _batch_user_status("citizen")
+
+
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# Below this length trigrams can't narrow the search; match prefixes instead
+SEARCH_MIN_TRGM = 3
+
+
+def _like_escape(q):
+    return q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _search_users(role, columns):
     q = request.args.get("q", "").strip()
     status = request.args.get("status", "all")
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+    try:
+        limit = int(request.args.get("limit", SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = min(max(limit, 1), SEARCH_MAX_LIMIT)
 
-    sql = """
-        SELECT id, name, email, department, status
-        FROM users
-        WHERE role='officer'
-    """
-    params = []
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(*search_users_query(role, columns, q, status, limit))
+        rows = cur.fetchall()
 
-    if status != "all":
-        sql += " AND status=%s"
-        params.append(status)
+    return jsonify(rows)
 
-    if q:
-        sql += " AND (name ILIKE %s OR email ILIKE %s)"
-        params.extend([f"%{q}%", f"%{q}%"])
 
-    sql += " ORDER BY id DESC"
+def search_users_query(role, columns, q, status, limit):
+    where = "role=%s"
+    params = [role]
 
-    cur.execute(sql, params)
-    officers = cur.fetchall()
+    if status != "all":
+        where += " AND status=%s"
+        params.append(status)
 
-    cur.close()
-    db.close()
+    if not q:
+        return f"""
+            SELECT {columns}
+            FROM users
+            WHERE {where}
+            ORDER BY id DESC
+            LIMIT %s
+        """, params + [limit]
+
+    escaped = _like_escape(q.lower())
+    prefix = escaped + "%"
+
+    if len(q) < SEARCH_MIN_TRGM:
+        # users_name_prefix_idx / users_email_prefix_idx
+        sql = f"""
+            SELECT {columns},
+                   1 - GREATEST(word_similarity(%s, name),
+                                word_similarity(%s, email)) AS distance
+            FROM users
+            WHERE {where} AND (lower(name) LIKE %s OR lower(email) LIKE %s)
+        """
+        params = [q, q] + params + [prefix, prefix]
+    else:
+        # users_name_trgm_gist_idx / users_email_trgm_gist_idx: each branch
+        # walks its index nearest-first by word distance (<<->, i.e.
+        # 1 - word_similarity) and stops at limit, so at most 2 * limit
+        # candidates are ranked below
+        branches = []
+        branch_params = []
+        for column in ("name", "email"):
+            branches.append(f"""
+                (
+                    SELECT {columns}, %s <<-> {column} AS distance
+                    FROM users
+                    WHERE {where} AND {column} ILIKE %s
+                    ORDER BY %s <<-> {column}
+                    LIMIT %s
+                )
+            """)
+            branch_params += [q] + params + [f"%{escaped}%", q, limit]
+
+        # A user found through both columns keeps the closer distance
+        sql = f"""
+            SELECT DISTINCT ON (id) *
+            FROM ({" UNION ALL ".join(branches)}) candidates
+            ORDER BY id, distance
+        """
+        params = branch_params
+
+    # Prefix matches first, then closest trigram match, newest first
+    return f"""
+        SELECT {columns} FROM ({sql}) matches
+        ORDER BY
+            (lower(name) LIKE %s OR lower(email) LIKE %s) DESC,
+            distance,
+            id DESC
+        LIMIT %s
+    """, params + [prefix, prefix, limit]
 
-    return jsonify(officers)
+
+@admin_bp.route("/officers/search")
+@admin_required
+def search_officers():
+    return _search_users("officer", "id, name, email, department, status")
 
 
 @admin_bp.route("/users/search")
 @admin_required
 def search_users():
-    q = request.args.get("q", "").strip()
-    status = request.args.get("status", "all")
+    return _search_users("citizen", "id, name, email, phone, pincode, status")
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+# -----------------------------
+# DB POOL STATS (per worker)
+# -----------------------------
 
-    sql = """
-        SELECT id, name, email, phone, pincode, status
-        FROM users
-        WHERE role='citizen'
-    """
-    params = []
+@admin_bp.route("/db/pool")
+@admin_required
+def db_pool_stats():
+    return jsonify(pool_stats())
 
-    if status != "all":
-        sql += " AND status=%s"
-        params.append(status)
 
-    if q:
-        sql += " AND (name ILIKE %s OR email ILIKE %s)"
-        params.extend([f"%{q}%", f"%{q}%"])
+# -----------------------------
+# UPLOAD INGEST STATS (per worker)
+# -----------------------------
 
-    sql += " ORDER BY id DESC"
+@admin_bp.route("/uploads/stats")
+@admin_required
+def upload_stats():
+    return jsonify(get_ingest_stats())
 
-    cur.execute(sql, params)
-    users = cur.fetchall()
+# =============================
+# ISSUE STATS (from issue_counters, no table scan)
+# =============================
 
-    cur.close()
-    db.close()
+@admin_bp.route("/stats")
+@admin_required
+def issue_stats():
+    with db_cursor() as cur:
+        rows = read_counters(cur)
+
+    total = 0
+    by_type, by_status, by_department = {}, {}, {}
+    counts = []
+
+    for detected_issue, status, department, count in rows:
+        total += count
+        by_type[detected_issue] = by_type.get(detected_issue, 0) + count
+        by_status[status] = by_status.get(status, 0) + count
+        by_department[department] = by_department.get(department, 0) + count
+        counts.append({
+            "detected_issue": detected_issue,
+            "status": status,
+            "assigned_department": department,
+            "count": count
+        })
+
+    return jsonify({
+        "total": total,
+        "by_type": by_type,
+        "by_status": by_status,
+        "by_department": by_department,
+        "counts": counts
+    })
 
-    return jsonify(users)
 
 # =============================
 # ISSUE COUNT ROUTES
 # =============================
 
-@admin_bp.route("/count/garbage")
-def count_garbage_issues():
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM issues
-        WHERE detected_issue = 'garbage'
-    """)
+def _count_type(detected_issue):
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT COALESCE(SUM(count), 0)
+            FROM issue_counters
+            WHERE detected_issue = %s
+        """, (detected_issue,))
 
-    count = cur.fetchone()[0]
+        return int(cur.fetchone()[0])
 
-    cur.close()
-    db.close()
 
-    return jsonify({"count": count})
+@admin_bp.route("/count/garbage")
+def count_garbage_issues():
+    return jsonify({"count": _count_type("garbage")})
 
 
 @admin_bp.route("/count/pothole")
 def count_pothole_issues():
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM issues
-        WHERE detected_issue = 'pothole'
-    """)
-
-    count = cur.fetchone()[0]
-
-    cur.close()
-    db.close()
-
-    return jsonify({"count": count})
+    return jsonify({"count": _count_type("pothole")})
 
 
 @admin_bp.route("/count/general")
 def count_general():
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM issues
-        WHERE detected_issue = 'general'
-    """)
-
-    count = cur.fetchone()[0]
-
-    cur.close()
-    db.close()
-
-    return jsonify({"count": count})
+    return jsonify({"count": _count_type("general")})
 
 
 from flask import session, redirect, url_for
@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, render_template, redirect, session
-from werkzeug.security import generate_password_hash, check_password_hash
-from routes.db import get_db
+from routes.db import db_cursor
 from psycopg2.extras import RealDictCursor
+from services.password_hasher import HasherBusy, hash_password, verify_password
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -9,6 +9,10 @@ auth_bp = Blueprint("auth", __name__)
 # LOGIN
 # -----------------------------
 
+# Also EXPLAINed by migrations/check_indexes.py
+USER_BY_EMAIL_SQL = "SELECT * FROM users WHERE email = %s"
+
+
 @auth_bp.route("/login", methods=["GET", "POST"])
 def login():
     if request.method == "GET":
@@ -31,24 +35,29 @@ def login():
         return redirect("/admin-dashboard")
 
     # ---------------- USER LOGIN ----------------
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute(
-        "SELECT * FROM users WHERE email = %s",
-        (email,)
-    )
-    user = cur.fetchone()
-
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(USER_BY_EMAIL_SQL, (email,))
+        user = cur.fetchone()
 
     if not user:
         return render_template("login.html", error="Invalid credentials")
 
-    if not check_password_hash(user["password"], password):
+    try:
+        ok, new_hash = verify_password(user["password"], password)
+    except HasherBusy:
+        return render_template("login.html", error="Server busy, please retry"), 503
+
+    if not ok:
         return render_template("login.html", error="Invalid credentials")
 
+    # Hash cost changed since this password was stored: upgrade it now
+    if new_hash:
+        with db_cursor(commit=True) as cur:
+            cur.execute(
+                "UPDATE users SET password = %s WHERE id = %s AND password = %s",
+                (new_hash, user["id"], user["password"])
+            )
+
     if user["status"] != "active":
         return render_template(
             "login.html",
@@ -108,10 +117,13 @@ def signup():
 
     status = "pending" if role == "officer" else "active"
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
+    # Hash before borrowing a DB connection: it is the slow part
     try:
+        hashed_password = hash_password(password)
+    except HasherBusy:
+        return jsonify(success=False, message="Server busy, please retry"), 503
+
+    with db_cursor(RealDictCursor, commit=True) as cur:
         # Duplicate email check
         cur.execute(
             "SELECT id FROM users WHERE email = %s",
@@ -120,8 +132,6 @@ def signup():
         if cur.fetchone():
             return jsonify(success=False, message="Email already exists"), 409
 
-        hashed_password = generate_password_hash(password)
-
         # Insert user
         cur.execute(
             """
@@ -143,11 +153,6 @@ def signup():
         )
 
         user_id = cur.fetchone()["id"]
-        db.commit()
-
-    finally:
-        cur.close()
-        db.close()
 
     # Auto-login only active users
     if status == "active":
@@ -0,0 +1,62 @@
+from flask import request
+
+MAX_BATCH_IDS = 500
+
+ISSUE_STATUSES = ("Pending", "In Progress", "Resolved")
+USER_STATUSES = ("active", "blocked")
+
+
+class InvalidBatch(ValueError):
+    pass
+
+
+# -----------------------------
+# BATCH REQUESTS
+# -----------------------------
+# Body is JSON {"ids": [...], "status": "..."} or a form with repeated
+# ids=... fields. Ids are de-duplicated and sorted so concurrent batches
+# lock rows in the same order.
+
+def batch_args(allowed_statuses):
+    payload = request.get_json(silent=True)
+    if payload is not None:
+        raw_ids = payload.get("ids")
+        status = payload.get("status")
+    else:
+        raw_ids = request.form.getlist("ids")
+        status = request.form.get("status")
+
+    if not isinstance(raw_ids, list) or not raw_ids:
+        raise InvalidBatch("ids must be a non-empty list")
+    if len(raw_ids) > MAX_BATCH_IDS:
+        raise InvalidBatch(f"At most {MAX_BATCH_IDS} ids per batch")
+    if status not in allowed_statuses:
+        raise InvalidBatch(f"status must be one of: {', '.join(allowed_statuses)}")
+
+    try:
+        ids = sorted({int(i) for i in raw_ids})
+    except (TypeError, ValueError):
+        raise InvalidBatch("ids must be integers")
+
+    return ids, status
+
+
+def batch_result(ids, status, updated, unchanged):
+    # Re-sending the same batch is safe: rows already at the target status
+    # report "unchanged" instead of being written again.
+    results = {}
+    for i in ids:
+        if i in updated:
+            results[str(i)] = "updated"
+        elif i in unchanged:
+            results[str(i)] = "unchanged"
+        else:
+            results[str(i)] = "not_found"
+
+    return {
+        "status": status,
+        "results": results,
+        "updated": len(updated),
+        "unchanged": len(unchanged),
+        "not_found": len(ids) - len(updated) - len(unchanged),
+    }
@@ -0,0 +1,204 @@
+import sys
+from collections import defaultdict
+
+from psycopg2.extras import execute_values
+
+from routes.db import db_cursor
+from utils.geo_utils import geohash_encode
+
+# -----------------------------
+# ISSUE COUNTERS + DAILY ROLLUPS
+# -----------------------------
+# Every write to `issues` calls one of these with the same cursor, so the
+# aggregate rows change in the same transaction as the issue itself.
+# Tables: migrations/versions/0001_issue_counters.sql, 0002_issue_daily_rollups.sql
+
+UNKNOWN = "unknown"
+
+ROLLUP_GRANULARITIES = ("day", "week", "month")
+
+
+def bump_counters(cur, entries):
+    # entries: (detected_issue, status, department, day, delta). Folded per
+    # row, then upserted in primary-key order: two transactions moving
+    # issues in opposite directions lock the same rows in the same order
+    # instead of deadlocking.
+    counters = defaultdict(int)
+    rollups = defaultdict(int)
+    for detected_issue, status, department, day, delta in entries:
+        detected_issue = detected_issue or UNKNOWN
+        status = status or UNKNOWN
+        department = department or UNKNOWN
+        counters[(detected_issue, status, department)] += delta
+        rollups[(department, day, detected_issue, status)] += delta
+
+    counter_rows = sorted(key + (delta,) for key, delta in counters.items() if delta)
+    rollup_rows = sorted(key + (delta,) for key, delta in rollups.items() if delta)
+    # The two can net out independently: a move between days nets to zero
+    # in issue_counters but not in the rollups
+    if counter_rows:
+        execute_values(cur, """
+            INSERT INTO issue_counters
+                (detected_issue, status, assigned_department, count)
+            VALUES %s
+            ON CONFLICT (detected_issue, status, assigned_department)
+            DO UPDATE SET count = issue_counters.count + EXCLUDED.count
+        """, counter_rows, page_size=len(counter_rows))
+
+    if rollup_rows:
+        execute_values(cur, """
+            INSERT INTO issue_daily_rollups
+                (assigned_department, day, detected_issue, status, count)
+            VALUES %s
+            ON CONFLICT (assigned_department, day, detected_issue, status)
+            DO UPDATE SET count = issue_daily_rollups.count + EXCLUDED.count
+        """, rollup_rows, page_size=len(rollup_rows))
+
+
+def bump_counter(cur, detected_issue, status, department, day, delta):
+    bump_counters(cur, [(detected_issue, status, department, day, delta)])
+
+
+def move_counter(cur, detected_issue, department, day, old_status, new_status):
+    if old_status == new_status:
+        return
+    bump_counters(cur, [
+        (detected_issue, old_status, department, day, -1),
+        (detected_issue, new_status, department, day, 1),
+    ])
+
+
+def read_counters(cur):
+    cur.execute("""
+        SELECT detected_issue, status, assigned_department, count
+        FROM issue_counters
+        WHERE count > 0
+    """)
+    return cur.fetchall()
+
+
+def read_rollup(cur, department, granularity, status=None, detected_issue=None,
+                start=None, end=None):
+    sql = """
+        SELECT
+            date_trunc(%s, day::timestamp)::date AS bucket,
+            SUM(count) AS count
+        FROM issue_daily_rollups
+        WHERE assigned_department = %s
+    """
+    params = [granularity, department]
+
+    if status:
+        sql += " AND status = %s"
+        params.append(status)
+    if detected_issue:
+        sql += " AND detected_issue = %s"
+        params.append(detected_issue)
+    if start:
+        sql += " AND day >= %s"
+        params.append(start)
+    if end:
+        sql += " AND day <= %s"
+        params.append(end)
+
+    sql += " GROUP BY 1 HAVING SUM(count) > 0 ORDER BY 1"
+
+    cur.execute(sql, params)
+    return cur.fetchall()
+
+
+# -----------------------------
+# GEOHASH TILE AGGREGATES
+# -----------------------------
+# Per geohash cell (precisions 1-7), type and status: issue count plus the
+# coordinate sums for the cluster centroid. Inserts, deletes and status
+# changes pass (detected_issue, status, lat, lng, delta) entries here.
+# Table: migrations/versions/0007_issue_tiles.sql
+
+TILE_PRECISIONS = range(1, 8)
+
+
+def bump_tiles(cur, entries):
+    # Folded per key first: one upsert statement may not touch a row twice
+    deltas = defaultdict(lambda: [0, 0.0, 0.0])
+    for detected_issue, status, lat, lng, delta in entries:
+        if lat is None or lng is None:
+            continue
+        lat, lng = float(lat), float(lng)
+        full = geohash_encode(lat, lng, TILE_PRECISIONS[-1])
+        for precision in TILE_PRECISIONS:
+            acc = deltas[(precision, full[:precision],
+                          detected_issue or UNKNOWN, status or UNKNOWN)]
+            acc[0] += delta
+            acc[1] += lat * delta
+            acc[2] += lng * delta
+
+    # Key order, like bump_counters: concurrent moves lock tiles in the
+    # same order instead of deadlocking
+    rows = sorted(key + tuple(acc) for key, acc in deltas.items() if any(acc))
+    if not rows:
+        return
+
+    execute_values(cur, """
+        INSERT INTO issue_tiles
+            (precision, geohash, detected_issue, status, count, sum_lat, sum_lng)
+        VALUES %s
+        ON CONFLICT (precision, geohash, detected_issue, status)
+        DO UPDATE SET count = issue_tiles.count + EXCLUDED.count,
+                      sum_lat = issue_tiles.sum_lat + EXCLUDED.sum_lat,
+                      sum_lng = issue_tiles.sum_lng + EXCLUDED.sum_lng
+    """, rows, page_size=len(rows))
+
+
+def read_tiles(cur, precision, cells):
+    cur.execute("""
+        SELECT geohash, detected_issue, status, count, sum_lat, sum_lng
+        FROM issue_tiles
+        WHERE precision = %s AND geohash = ANY(%s) AND count > 0
+    """, (precision, cells))
+    return cur.fetchall()
+
+
+def rebuild_tiles(cur, out=None):
+    # Recompute from `issues`. The table lock is taken before reading, so a
+    # write racing the rebuild either finished before it (and is counted
+    # here) or waits for it and applies its delta on top.
+    cur.execute("LOCK TABLE issue_tiles IN EXCLUSIVE MODE")
+    cur.execute("DELETE FROM issue_tiles")
+
+    # Server-side cursor on the same transaction: issues are read in
+    # batches while the upserts go through `cur`.
+    reader = cur.connection.cursor(name="rebuild_tiles")
+    total = 0
+    try:
+        reader.execute("""
+            SELECT detected_issue, status, latitude, longitude
+            FROM issues
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+        """)
+        while True:
+            rows = reader.fetchmany(5000)
+            if not rows:
+                break
+            bump_tiles(cur, [(issue, status, lat, lng, 1) for issue, status, lat, lng in rows])
+            total += len(rows)
+            if out:
+                out(f"tiled {total} issues")
+    finally:
+        reader.close()
+    return total
+
+
+def main(argv):
+    if argv != ["--rebuild-tiles"]:
+        print("usage: python -m routes.counters --rebuild-tiles", file=sys.stderr)
+        return 2
+
+    with db_cursor(commit=True) as cur:
+        total = rebuild_tiles(cur, out=print)
+    print(f"rebuilt tiles for {total} issues")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,15 +1,349 @@
 from dotenv import load_dotenv
 load_dotenv()
 
-import psycopg2
-from psycopg2.extras import RealDictCursor
 import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+from services.metrics import (
+    DB_CONNECT_SECONDS, DB_POOL_WAIT_SECONDS, DB_ROWS, current_endpoint,
+    observe_query
+)
+
+# -----------------------------
+# POOL CONFIG
+# -----------------------------
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+# Idle connections older than this are pinged before being handed out
+DB_POOL_CHECK_AFTER = float(os.getenv("DB_POOL_CHECK_AFTER", "30"))
+# Rows per round trip for server-side (named) cursors
+DB_STREAM_BATCH = int(os.getenv("DB_STREAM_BATCH", "500"))
+
+
+class PoolTimeout(Exception):
+    pass
+
 
 def get_db():
     return psycopg2.connect(
         os.environ["DATABASE_URL"],
-        sslmode="require"
+        sslmode=os.getenv("DB_SSLMODE", "require")
     )
 
-db = get_db()
-cur = db.cursor(cursor_factory=RealDictCursor)
+
+# -----------------------------
+# CONNECTION POOL
+# -----------------------------
+
+class ConnectionPool:
+    def __init__(self, minconn, maxconn, timeout, connect=get_db):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._connect = connect
+
+        self._cond = threading.Condition()
+        self._idle = deque()          # (conn, last_used)
+        self._in_use = 0
+        self._opening = 0
+
+        self._waiting = 0
+        self._borrows = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _size(self):
+        return len(self._idle) + self._in_use + self._opening
+
+    def _healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < DB_POOL_CHECK_AFTER:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+
+        with self._cond:
+            self._waiting += 1
+            try:
+                while True:
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._size() < self.maxconn:
+                        conn, last_used = None, None
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection available within {self.timeout}s"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+        # Connect / ping outside the lock so other borrowers are not blocked
+        if conn is not None and not self._healthy(conn, last_used):
+            self._close_quietly(conn)
+            with self._cond:
+                self._in_use -= 1
+                self._opening += 1
+                self._discarded += 1
+            conn = None
+
+        if conn is None:
+            try:
+                connect_started = time.monotonic()
+                conn = self._connect()
+                DB_CONNECT_SECONDS.observe(time.monotonic() - connect_started)
+            except Exception:
+                with self._cond:
+                    self._opening -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._opening -= 1
+                self._in_use += 1
+
+        waited = time.monotonic() - start
+        DB_POOL_WAIT_SECONDS.observe(waited)
+        with self._cond:
+            self._borrows += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        return conn
+
+    def putconn(self, conn):
+        keep = not conn.closed
+        if keep:
+            try:
+                # Never hand out a connection with an open transaction
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                keep = False
+
+        with self._cond:
+            self._in_use -= 1
+            if keep and self._size() < self.maxconn:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._discarded += 1
+                keep = False
+            self._cond.notify()
+
+        if not keep:
+            self._close_quietly(conn)
+
+    def closeall(self):
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "pid": os.getpid(),
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size(),
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiting": self._waiting,
+                "borrows": self._borrows,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_avg_ms": round(self._wait_total / self._borrows * 1000, 3) if self._borrows else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000, 3),
+            }
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# -----------------------------
+# PER-WORKER POOL
+# -----------------------------
+# Gunicorn forks workers from the master; sockets inherited from the parent
+# must never be reused (or closed) by the child, so each pid gets its own pool.
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+# Pools inherited from a parent process. Never used or closed here, and
+# never garbage-collected either: freeing a psycopg2 connection runs
+# PQfinish, which would send Terminate on the parent's live session.
+_inherited = []
+
+
+def get_pool():
+    global _pool, _pool_pid
+
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            if _pool is not None:
+                _inherited.append(_pool)
+            _pool = ConnectionPool(DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT)
+            _pool_pid = pid
+    return _pool
+
+
+def _reset_after_fork():
+    global _pool, _pool_pid, _pool_lock
+    # Set the parent's pool aside (see _inherited) and start a fresh one
+    if _pool is not None:
+        _inherited.append(_pool)
+    _pool = None
+    _pool_pid = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def pool_stats():
+    if _pool is None or _pool_pid != os.getpid():
+        return {"pid": os.getpid(), "size": 0, "in_use": 0, "waiting": 0}
+    return _pool.stats()
+
+
+# -----------------------------
+# QUERY TIMING
+# -----------------------------
+# Every cursor handed out below is a subclass of the requested factory that
+# reports execute time and row counts to services.metrics.
+
+_timed_cursors = {}
+
+
+def _timed_cursor(cursor_factory):
+    base = cursor_factory or extensions.cursor
+    timed = _timed_cursors.get(base)
+    if timed is None:
+        class TimedCursor(base):
+            def execute(self, query, vars=None):
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, vars)
+                finally:
+                    observe_query(started, self.rowcount)
+
+            def executemany(self, query, vars_list):
+                started = time.perf_counter()
+                try:
+                    return super().executemany(query, vars_list)
+                finally:
+                    observe_query(started, self.rowcount)
+
+        timed = _timed_cursors[base] = TimedCursor
+    return timed
+
+
+# -----------------------------
+# CONTEXT MANAGERS
+# -----------------------------
+
+@contextmanager
+def db_connection():
+    pool = get_pool()
+    db = pool.getconn()
+    try:
+        yield db
+    except Exception:
+        if not db.closed:
+            try:
+                db.rollback()
+            except psycopg2.Error:
+                pass
+        raise
+    finally:
+        pool.putconn(db)
+
+
+# id(connection) -> callbacks for its open transaction
+_after_commit = {}
+
+
+def after_commit(cur, callback):
+    # callback() runs once cur's transaction is committed by
+    # db_cursor(commit=True); dropped if it rolls back
+    _after_commit.setdefault(id(cur.connection), []).append(callback)
+
+
+@contextmanager
+def db_cursor(cursor_factory=None, commit=False):
+    with db_connection() as db:
+        cur = db.cursor(cursor_factory=_timed_cursor(cursor_factory))
+        try:
+            yield cur
+            if commit:
+                db.commit()
+                for callback in _after_commit.pop(id(db), ()):
+                    callback()
+        finally:
+            _after_commit.pop(id(db), None)
+            cur.close()
+
+
+def stream_rows(sql, params=None, cursor_factory=None, batch_size=DB_STREAM_BATCH):
+    # Yields lists of at most batch_size rows from a server-side cursor, so
+    # only one batch is ever held in worker memory. The pooled connection
+    # stays borrowed until the generator is exhausted or closed.
+    with db_connection() as db:
+        cur = db.cursor(
+            name=f"stream_{uuid.uuid4().hex}",
+            cursor_factory=_timed_cursor(cursor_factory)
+        )
+        cur.itersize = batch_size
+        streamed = 0
+        try:
+            cur.execute(sql, params)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                streamed += len(rows)
+                yield rows
+        finally:
+            # A named cursor's execute() reports no rows; count them here
+            DB_ROWS.labels(current_endpoint()).observe(streamed)
+            cur.close()
@@ -1,48 +1,226 @@
 from flask import Blueprint, jsonify, request, send_from_directory, current_app
-from routes.db import get_db
+from routes.db import db_cursor, stream_rows
 from psycopg2.extras import RealDictCursor
 import os
 
+from routes.counters import TILE_PRECISIONS, read_tiles
+from routes.pagination import InvalidCursor, decode_cursor, paginate, paged_response
+from routes.streaming import stream_format, streamed_response
+from services.issue_versions import make_etag, not_modified, versions, with_etag
+from utils.geo_utils import (
+    EARTH_RADIUS_M, bounding_box, geohash_cell_size, geohash_cover, tile_bounds
+)
+
 issues_bp = Blueprint("issues", __name__)
 
 # -----------------------------
 # Serve uploaded images
 # -----------------------------
 
+# Stored under a fresh uuid name and never rewritten, so a copy never goes stale
+UPLOAD_MAX_AGE = 365 * 24 * 3600
+
+
 @issues_bp.route("/uploads/<path:filename>")
 def serve_uploaded_image(filename):
     upload_folder = os.path.join(current_app.root_path, "static", "uploads")
-    return send_from_directory(upload_folder, filename)
+    response = send_from_directory(upload_folder, filename, max_age=UPLOAD_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+# -----------------------------
+# Map tiles (clustered counts)
+# -----------------------------
+
+TILE_MAX_ZOOM = 22
+# Finest geohash precision whose cover of the tile stays under this
+TILE_MAX_CELLS = 256
+
+
+def tile_precision(min_lat, max_lat, min_lng, max_lng):
+    best = TILE_PRECISIONS[0]
+    for precision in TILE_PRECISIONS:
+        height, width = geohash_cell_size(precision)
+        cells = ((max_lat - min_lat) / height + 1) * ((max_lng - min_lng) / width + 1)
+        if cells > TILE_MAX_CELLS:
+            break
+        best = precision
+    return best
+
+
+@issues_bp.route("/issues/tiles/<int:z>/<int:x>/<int:y>", methods=["GET"])
+def issue_tiles(z, x, y):
+    if not (0 <= z <= TILE_MAX_ZOOM and 0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        return jsonify({"error": "Invalid tile"}), 400
+
+    status = request.args.get("status")
+    issue_type = request.args.get("type")
+
+    min_lat, max_lat, min_lng, max_lng = tile_bounds(z, x, y)
+    precision = tile_precision(min_lat, max_lat, min_lng, max_lng)
+    cover = geohash_cover(min_lat, max_lat, min_lng, max_lng, precision)
+
+    with db_cursor() as cur:
+        rows = read_tiles(cur, precision, cover)
+
+    cells = {}
+    for geohash, detected_issue, row_status, count, sum_lat, sum_lng in rows:
+        if status and row_status != status:
+            continue
+        if issue_type and detected_issue != issue_type:
+            continue
+
+        cell = cells.setdefault(geohash, {
+            "geohash": geohash, "count": 0, "sum_lat": 0.0, "sum_lng": 0.0,
+            "types": {}, "statuses": {}
+        })
+        cell["count"] += count
+        cell["sum_lat"] += sum_lat
+        cell["sum_lng"] += sum_lng
+        cell["types"][detected_issue] = cell["types"].get(detected_issue, 0) + count
+        cell["statuses"][row_status] = cell["statuses"].get(row_status, 0) + count
+
+    clusters = []
+    for cell in cells.values():
+        if cell["count"] <= 0:
+            continue
+        lat = cell.pop("sum_lat") / cell["count"]
+        lng = cell.pop("sum_lng") / cell["count"]
+        # Edge cells overlap the neighbouring tile: the tile holding the
+        # centroid owns the cluster, so it is drawn once
+        if not (min_lat <= lat < max_lat and min_lng <= lng < max_lng):
+            continue
+        cell["lat"] = round(lat, 6)
+        cell["lng"] = round(lng, 6)
+        clusters.append(cell)
+
+    return jsonify({
+        "z": z,
+        "x": x,
+        "y": y,
+        "precision": precision,
+        "total": sum(c["count"] for c in clusters),
+        "cells": clusters
+    })
 
 
 # -----------------------------
-# Nearby issues (TEMP: all)
+# Nearby issues (radius search)
 # -----------------------------
 
+NEARBY_DEFAULT_RADIUS_M = 5000
+NEARBY_MAX_RADIUS_M = 50000
+NEARBY_DEFAULT_LIMIT = 100
+NEARBY_MAX_LIMIT = 500
+
+
+# Haversine in SQL, the formula of utils.geo_utils.get_distance_m.
+# Params: (lat, lat, lng). Paged and streamed listings order, filter and
+# page on this one expression, so a cursor means the same in both.
+DISTANCE_SQL = f"""
+    2 * {EARTH_RADIUS_M} * ASIN(LEAST(1, SQRT(
+        POWER(SIN(RADIANS(latitude::float8 - %s) / 2), 2)
+        + COS(RADIANS(%s)) * COS(RADIANS(latitude::float8))
+          * POWER(SIN(RADIANS(longitude::float8 - %s) / 2), 2)
+    )))
+"""
+
+
+def nearby_query(lat, lng, radius_m, cursor=None):
+    # (sql, params), also EXPLAINed by migrations/check_indexes.py. The
+    # bounding-box prefilter runs on the (latitude, longitude) index; the
+    # circle, order and keyset on the exact distance. No LIMIT: streaming
+    # takes everything after the cursor.
+    min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_m)
+
+    after, after_params = "TRUE", []
+    if cursor:
+        after, after_params = "(distance_m, issue_id) > (%s, %s)", list(cursor)
+
+    return f"""
+        SELECT *
+        FROM (
+            SELECT
+                issue_id,
+                detected_issue,
+                description,
+                location_text,
+                status,
+                created_at,
+                image1_path,
+                latitude,
+                longitude,
+                {DISTANCE_SQL} AS distance_m
+            FROM issues
+            WHERE latitude BETWEEN %s AND %s
+              AND longitude BETWEEN %s AND %s
+        ) nearby
+        WHERE distance_m <= %s AND {after}
+        ORDER BY distance_m, issue_id
+    """, [lat, lat, lng, min_lat, max_lat, min_lng, max_lng, radius_m] + after_params
+
+
 @issues_bp.route("/issues/nearby", methods=["GET"])
 def nearby_issues():
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    # TEMP: return all issues
-    cur.execute("""
-        SELECT
-            issue_id,
-            detected_issue,
-            description,
-            location_text,
-            status,
-            created_at,
-            image1_path
-        FROM issues
-        ORDER BY created_at DESC
-    """)
-
-    issues = cur.fetchall()
-    cur.close()
-    db.close()
-
-    return jsonify(issues)
+    try:
+        lat = float(request.args["lat"])
+        lng = float(request.args["lng"])
+        radius_m = float(request.args.get("radius_m", NEARBY_DEFAULT_RADIUS_M))
+        limit = int(request.args.get("limit", NEARBY_DEFAULT_LIMIT))
+    except (KeyError, ValueError):
+        return jsonify({"error": "lat and lng are required"}), 400
+
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({"error": "Invalid coordinates"}), 400
+
+    radius_m = min(max(radius_m, 1), NEARBY_MAX_RADIUS_M)
+    limit = min(max(limit, 1), NEARBY_MAX_LIMIT)
+
+    # Cursor is (distance_m, issue_id) of the last row already sent
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            last_distance, last_id = decode_cursor(cursor)
+            cursor = float(last_distance), int(last_id)
+        except (ValueError, TypeError):
+            raise InvalidCursor("Cursor does not match this listing")
+
+    sql, params = nearby_query(lat, lng, radius_m, cursor)
+
+    fmt = stream_format()
+    if fmt:
+        return streamed_response(
+            _rounded(stream_rows(sql, params, RealDictCursor)), fmt
+        )
+
+    # Any issue change may move this listing, so it follows the collection
+    # version; the query string keys the rest
+    etag = make_etag(versions.collection_version(), request.full_path)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(sql + " LIMIT %s", params + [limit + 1])
+        issues = cur.fetchall()
+
+    # The cursor keeps the unrounded distance Postgres compares against
+    issues, next_cursor = paginate(
+        issues, limit, lambda i: (i["distance_m"], i["issue_id"])
+    )
+    for row in issues:
+        row["distance_m"] = round(row["distance_m"], 1)
+
+    return with_etag(paged_response(issues, next_cursor), etag)
+
+
+def _rounded(batches):
+    for rows in batches:
+        for row in rows:
+            row["distance_m"] = round(row["distance_m"], 1)
+        yield rows
 
 
 # -----------------------------
@@ -51,28 +229,29 @@ def nearby_issues():
 
 @issues_bp.route("/issue/<int:issue_id>", methods=["GET"])
 def get_issue_by_id(issue_id):
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("""
-        SELECT
-            issue_id,
-            detected_issue,
-            description,
-            location_text,
-            status,
-            created_at,
-            image1_path,
-            assigned_department
-        FROM issues
-        WHERE issue_id = %s
-    """, (issue_id,))
-
-    issue = cur.fetchone()
-    cur.close()
-    db.close()
+    etag = make_etag(versions.issue_version(issue_id))
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute("""
+            SELECT
+                issue_id,
+                detected_issue,
+                description,
+                location_text,
+                status,
+                created_at,
+                image1_path,
+                assigned_department
+            FROM issues
+            WHERE issue_id = %s
+        """, (issue_id,))
+
+        issue = cur.fetchone()
 
     if not issue:
         return jsonify({"error": "Issue not found"}), 404
 
-    return jsonify(issue)
+    return with_etag(jsonify(issue), etag)
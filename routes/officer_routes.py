@@ -1,6 +1,12 @@
+from datetime import date
+
 from flask import Blueprint, jsonify, session, request
 from auth_utils import officer_required
-from routes.db import get_db
+from routes.batch import ISSUE_STATUSES, batch_args, batch_result
+from routes.counters import ROLLUP_GRANULARITIES, bump_counters, bump_tiles, move_counter, read_rollup
+from routes.db import db_cursor
+from routes.pagination import page_args, keyset_after, paginate, paged_response
+from services.issue_versions import touch_issues
 from psycopg2.extras import RealDictCursor
 
 officer_bp = Blueprint(
@@ -12,39 +18,41 @@ officer_bp = Blueprint(
 # -----------------------------
 # OFFICER ISSUES (MAIN DASHBOARD)
 # -----------------------------
+# Query builders -> (sql, params), shared with migrations/check_indexes.py
+def officer_issues_query(dept, limit, cursor):
+    after, params = keyset_after(["created_at", "issue_id"], cursor)
+    return f"""
+        SELECT *
+        FROM issues
+        WHERE assigned_department = %s AND {after}
+        ORDER BY created_at DESC, issue_id DESC
+        LIMIT %s
+    """, [dept] + params + [limit + 1]
+
+
 @officer_bp.route("/issues")
 @officer_required
 def officer_issues():
     dept = session.get("department")
-    print("DEBUG session department =", dept)
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    # Debug: all issues
-    cur.execute("SELECT * FROM issues")
-    all_issues = cur.fetchall()
-    print("DEBUG total issues in DB =", len(all_issues))
-
-    # Filtered by department
-    cur.execute("""
-        SELECT *
-        FROM issues
-        WHERE assigned_department = %s
-    """, (dept,))
-    filtered_issues = cur.fetchall()
-    print("DEBUG matched issues =", len(filtered_issues))
+    limit, cursor = page_args()
 
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        # Filtered by department
+        cur.execute(*officer_issues_query(dept, limit, cursor))
+        filtered_issues = cur.fetchall()
 
-    return jsonify({
+    filtered_issues, next_cursor = paginate(
+        filtered_issues, limit, lambda i: (i["created_at"], i["issue_id"])
+    )
+    return paged_response({
         "officer": {
             "department": dept,
             "name": session.get("name")
         },
-        "issues": filtered_issues
-    })
+        "issues": filtered_issues,
+        "next_cursor": next_cursor
+    }, next_cursor)
 
 
 # -----------------------------
@@ -53,21 +61,17 @@ def officer_issues():
 @officer_bp.route("/issue/<int:issue_id>")
 @officer_required
 def officer_issue_details(issue_id):
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("""
-        SELECT
-            i.*,
-            u.phone AS citizen_phone
-        FROM issues i
-        LEFT JOIN users u ON i.citizen_email = u.email
-        WHERE i.issue_id = %s
-    """, (issue_id,))
-
-    issue = cur.fetchone()
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute("""
+            SELECT
+                i.*,
+                u.phone AS citizen_phone
+            FROM issues i
+            LEFT JOIN users u ON i.citizen_email = u.email
+            WHERE i.issue_id = %s
+        """, (issue_id,))
+
+        issue = cur.fetchone()
 
     if not issue:
         return jsonify({"error": "Issue not found"}), 404
@@ -86,46 +90,132 @@ def update_status():
 
     if not issue_id or not status:
         return jsonify({"error": "Missing data"}), 400
+    if status not in ISSUE_STATUSES:
+        return jsonify({
+            "error": f"status must be one of: {', '.join(ISSUE_STATUSES)}"
+        }), 400
 
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        UPDATE issues
-        SET status = %s
-        WHERE issue_id = %s
-    """, (status, issue_id))
+    dept = session.get("department")
 
-    db.commit()
-    cur.close()
-    db.close()
+    with db_cursor(commit=True) as cur:
+        # Only the officer's own department, as in the batch route
+        cur.execute("""
+            UPDATE issues i
+            SET status = %s
+            FROM (
+                SELECT issue_id, status
+                FROM issues
+                WHERE issue_id = %s AND assigned_department = %s
+                FOR UPDATE
+            ) old
+            WHERE i.issue_id = old.issue_id
+            RETURNING i.detected_issue, i.assigned_department,
+                      i.created_at::date, old.status, i.latitude, i.longitude
+        """, (status, issue_id, dept))
+
+        row = cur.fetchone()
+        if not row:
+            return jsonify({"error": "Issue not found"}), 404
+        if row[3] != status:
+            move_counter(cur, row[0], row[1], row[2], row[3], status)
+            bump_tiles(cur, [
+                (row[0], row[3], row[4], row[5], -1),
+                (row[0], status, row[4], row[5], 1)
+            ])
+            touch_issues(cur, [issue_id])
 
     return jsonify({"message": "Status updated"})
 
 
+@officer_bp.route("/update-status/batch", methods=["POST"])
+@officer_required
+def update_status_batch():
+    issue_ids, status = batch_args(ISSUE_STATUSES)
+    dept = session.get("department")
+
+    with db_cursor(commit=True) as cur:
+        # Only the officer's own department: other ids report "not_found"
+        cur.execute("""
+            SELECT issue_id, status
+            FROM issues
+            WHERE issue_id = ANY(%s) AND assigned_department = %s
+            ORDER BY issue_id
+            FOR UPDATE
+        """, (issue_ids, dept))
+        current = dict(cur.fetchall())
+
+        unchanged = {i for i, old in current.items() if old == status}
+        to_update = sorted(set(current) - unchanged)
+
+        moved = []
+        if to_update:
+            cur.execute("""
+                UPDATE issues
+                SET status = %s
+                WHERE issue_id = ANY(%s)
+                RETURNING issue_id, detected_issue, assigned_department,
+                          created_at::date, latitude, longitude
+            """, (status, to_update))
+            moved = cur.fetchall()
+
+        counts, tiles = [], []
+        for issue_id, issue, dept, day, lat, lng in moved:
+            counts.append((issue, current[issue_id], dept, day, -1))
+            counts.append((issue, status, dept, day, 1))
+            tiles.append((issue, current[issue_id], lat, lng, -1))
+            tiles.append((issue, status, lat, lng, 1))
+        bump_counters(cur, counts)
+        bump_tiles(cur, tiles)
+        touch_issues(cur, [row[0] for row in moved])
+
+    return jsonify(batch_result(
+        issue_ids, status, {row[0] for row in moved}, unchanged
+    ))
+
+
 # -----------------------------
 # PRIORITY ISSUES
 # -----------------------------
+def priority_issues_query(dept, limit, cursor):
+    # NULL scores sort last, as 0
+    after, params = keyset_after(["COALESCE(severity_score, 0)", "issue_id"], cursor)
+    return f"""
+        SELECT *
+        FROM issues
+        WHERE assigned_department = %s AND {after}
+        ORDER BY COALESCE(severity_score, 0) DESC, issue_id DESC
+        LIMIT %s
+    """, [dept] + params + [limit + 1]
+
+
 @officer_bp.route("/issues/priority")
 @officer_required
 def priority_issues():
     dept = session.get("department")
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+    limit, cursor = page_args()
 
-    cur.execute("""
-        SELECT *
-        FROM issues
-        WHERE assigned_department = %s
-        ORDER BY severity_score DESC
-    """, (dept,))
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(*priority_issues_query(dept, limit, cursor))
+        issues = cur.fetchall()
 
-    issues = cur.fetchall()
-    cur.close()
-    db.close()
+    issues, next_cursor = paginate(
+        issues, limit, lambda i: (i["severity_score"] or 0, i["issue_id"])
+    )
+    return paged_response(issues, next_cursor)
 
-    return jsonify(issues)
+
+# -----------------------------
+# ISSUE ROLLUPS (TIME SERIES)
+# -----------------------------
+@officer_bp.route("/issues/rollup")
+@officer_required
+def issues_rollup():
+    granularity = request.args.get("granularity", "month")
+    if granularity not in ROLLUP_GRANULARITIES:
+        return jsonify({"error": "granularity must be day, week or month"}), 400
+
+    return _rollup_response(granularity)
 
 
 # -----------------------------
@@ -134,19 +224,36 @@ def priority_issues():
 @officer_bp.route("/issues/monthly")
 @officer_required
 def monthly_issues():
-    dept = session.get("department")
+    return _rollup_response("month")
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
 
-    cur.execute("""
-        SELECT issue_id, created_at
-        FROM issues
-        WHERE assigned_department = %s
-    """, (dept,))
+def _rollup_response(granularity):
+    dept = session.get("department")
 
-    issues = cur.fetchall()
-    cur.close()
-    db.close()
+    try:
+        start = request.args.get("from")
+        end = request.args.get("to")
+        start = date.fromisoformat(start) if start else None
+        end = date.fromisoformat(end) if end else None
+    except ValueError:
+        return jsonify({"error": "from/to must be YYYY-MM-DD"}), 400
+
+    with db_cursor() as cur:
+        rows = read_rollup(
+            cur,
+            dept,
+            granularity,
+            status=request.args.get("status"),
+            detected_issue=request.args.get("issue_type"),
+            start=start,
+            end=end
+        )
 
-    return jsonify({"issues": issues})
+    return jsonify({
+        "department": dept,
+        "granularity": granularity,
+        "buckets": [
+            {"bucket": bucket.isoformat(), "count": int(count)}
+            for bucket, count in rows
+        ]
+    })
@@ -0,0 +1,88 @@
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request, jsonify
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+# -----------------------------
+# CURSOR TOKENS
+# -----------------------------
+# A cursor is the sort key of the last row on the previous page, e.g.
+# (created_at, issue_id), packed into an opaque url-safe token.
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor("Malformed cursor")
+
+    if not isinstance(values, list):
+        raise InvalidCursor("Malformed cursor")
+    return values
+
+
+# -----------------------------
+# REQUEST / QUERY HELPERS
+# -----------------------------
+
+def page_args():
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise InvalidCursor("limit must be an integer")
+
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    token = request.args.get("cursor")
+    return limit, decode_cursor(token) if token else None
+
+
+def keyset_after(columns, cursor):
+    # Rows strictly after the cursor for an ORDER BY <columns> DESC listing.
+    # Returns a SQL condition and its params; "TRUE" on the first page.
+    if cursor is None:
+        return "TRUE", []
+
+    if len(cursor) != len(columns):
+        raise InvalidCursor("Cursor does not match this listing")
+
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"({', '.join(columns)}) < ({placeholders})", list(cursor)
+
+
+def paginate(rows, limit, key):
+    # Queries fetch limit + 1 rows; the extra row only signals another page
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_cursor(key(rows[-1]))
+
+
+def paged_response(payload, next_cursor):
+    response = jsonify(payload)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
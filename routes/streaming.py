@@ -0,0 +1,37 @@
+from flask import Response, current_app, request, stream_with_context
+
+
+# -----------------------------
+# STREAMED LISTINGS
+# -----------------------------
+# ?stream=json   -> one JSON array, written batch by batch
+# ?stream=ndjson -> one JSON object per line
+
+def stream_format():
+    fmt = request.args.get("stream", "").strip().lower()
+    if fmt in ("", "0", "false"):
+        return None
+    return "ndjson" if fmt == "ndjson" else "json"
+
+
+def streamed_response(batches, fmt):
+    dumps = current_app.json.dumps
+
+    def ndjson():
+        for rows in batches:
+            yield "".join(dumps(row) + "\n" for row in rows)
+
+    def json_array():
+        yield "["
+        first = True
+        for rows in batches:
+            if not rows:
+                continue
+            chunk = ",".join(dumps(row) for row in rows)
+            yield chunk if first else "," + chunk
+            first = False
+        yield "]"
+
+    if fmt == "ndjson":
+        return Response(stream_with_context(ndjson()), mimetype="application/x-ndjson")
+    return Response(stream_with_context(json_array()), mimetype="application/json")
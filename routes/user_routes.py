@@ -1,5 +1,8 @@
+import io
 import os
+import time
 import uuid
+from concurrent.futures import TimeoutError as FutureTimeout
 from datetime import datetime, timedelta
 from PIL import Image
 import piexif
@@ -8,41 +11,69 @@ from flask import Blueprint, request, jsonify, session
 from psycopg2.extras import RealDictCursor
 
 from auth_utils import citizen_required
-from routes.db import get_db
+from routes.counters import bump_counter, bump_tiles
+from routes.db import db_cursor
+from routes.pagination import page_args, keyset_after, paginate, paged_response
+from services.batcher import BatcherFull
+from services.dedup import DEDUP_ENABLED, attach_report, find_duplicate, lock_area, to_signed
 from services.department_mapper import get_department
-from utils.geo_utils import dms_to_decimal, get_distance_m
-from utils.image_utils import save_image, allowed_file
+from services.issue_versions import make_etag, not_modified, touch_issues, versions, with_etag
+from services.ml_model import classify_with_phash
+from services.model_manager import ModelNotReady
+from services.prediction_cache import perceptual_hash
+from services.report_jobs import (
+    JobWorkers, complete_job, enqueue, get_job, load_uploads, new_job_id,
+    set_stage
+)
+from utils.geo_utils import dms_to_decimal, get_distance_m, grid_cell
+from utils.image_utils import remove_stored, save_image, store_image, allowed_file
 
 user_bp = Blueprint("user", __name__)
 
 UPLOAD_FOLDER = os.path.join("static", "uploads")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Store the upload, queue the rest and answer immediately (202 + job id)
+REPORT_ASYNC = os.getenv("REPORT_ASYNC", "0") == "1"
+
+# A citizen's complaints are the ones they filed plus the ones their
+# reports were merged into as a "+1" (issue_reports, "merged": true).
+MERGED_INTO = """
+    i.issue_id IN (SELECT r.issue_id FROM issue_reports r WHERE r.citizen_email = %s)
+    AND i.citizen_email IS DISTINCT FROM %s
+"""
+
+
 # -----------------------------
 # USER COUNTS (FIXED FOR POSTGRES)
 # -----------------------------
 
-@user_bp.route("/user/counts")
-@citizen_required
-def user_counts():
-    citizen_email = session.get("email")
-
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+# The hot listing queries are built by *_query(...) -> (sql, params)
+# helpers, so migrations/check_indexes.py EXPLAINs exactly what runs here.
 
-    cur.execute("""
+def user_counts_query(citizen_email):
+    return f"""
         SELECT
             COUNT(*) AS total,
             COUNT(*) FILTER (WHERE status='Pending')     AS pending,
             COUNT(*) FILTER (WHERE status='In Progress') AS progress,
             COUNT(*) FILTER (WHERE status='Resolved')    AS resolved
-        FROM issues
-        WHERE citizen_email = %s
-    """, (citizen_email,))
+        FROM (
+            SELECT status FROM issues WHERE citizen_email = %s
+            UNION ALL
+            SELECT i.status FROM issues i WHERE {MERGED_INTO}
+        ) mine
+    """, [citizen_email, citizen_email, citizen_email]
+
+
+@user_bp.route("/user/counts")
+@citizen_required
+def user_counts():
+    citizen_email = session.get("email")
 
-    data = cur.fetchone()
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(*user_counts_query(citizen_email))
+        data = cur.fetchone()
 
     return jsonify(data)
 
@@ -51,26 +82,47 @@ def user_counts():
 # USER ISSUES
 # -----------------------------
 
+def user_issues_query(citizen_email, limit, cursor):
+    after, params = keyset_after(["i.created_at", "i.issue_id"], cursor)
+
+    # Each branch stops at limit + 1 on its own index before the merge
+    return f"""
+        (
+            SELECT i.*, FALSE AS merged
+            FROM issues i
+            WHERE i.citizen_email = %s AND {after}
+            ORDER BY i.created_at DESC, i.issue_id DESC
+            LIMIT %s
+        )
+        UNION ALL
+        (
+            SELECT i.*, TRUE AS merged
+            FROM issues i
+            WHERE {MERGED_INTO} AND {after}
+            ORDER BY i.created_at DESC, i.issue_id DESC
+            LIMIT %s
+        )
+        ORDER BY created_at DESC, issue_id DESC
+        LIMIT %s
+    """, ([citizen_email] + params + [limit + 1]
+          + [citizen_email, citizen_email] + params + [limit + 1, limit + 1])
+
+
 @user_bp.route("/user/issues")
 @citizen_required
 def user_issues():
     citizen_email = session.get("email")
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
+    limit, cursor = page_args()
 
-    cur.execute("""
-        SELECT *
-        FROM issues
-        WHERE citizen_email = %s
-        ORDER BY created_at DESC
-    """, (citizen_email,))
-
-    issues = cur.fetchall()
-    cur.close()
-    db.close()
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(*user_issues_query(citizen_email, limit, cursor))
+        issues = cur.fetchall()
 
-    return jsonify(issues)
+    issues, next_cursor = paginate(
+        issues, limit, lambda i: (i["created_at"], i["issue_id"])
+    )
+    return paged_response(issues, next_cursor)
 
 
 # -----------------------------
@@ -83,37 +135,41 @@ def get_single_issue(issue_id):
     if not citizen_email:
         return jsonify({"error": "Unauthorized"}), 401
 
-    db = get_db()
-    cur = db.cursor(cursor_factory=RealDictCursor)
-
-    cur.execute("""
-        SELECT
-            issue_id,
-            detected_issue,
-            status,
-            location_text,
-            created_at,
-            image1_path,
-            image2_path
-        FROM issues
-        WHERE issue_id = %s AND citizen_email = %s
-    """, (issue_id, citizen_email))
-
-    issue = cur.fetchone()
-    cur.close()
-    db.close()
+    etag = make_etag(versions.issue_version(issue_id), "user", citizen_email)
+    cached = not_modified(etag, private=True)
+    if cached:
+        return cached
+
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute(f"""
+            SELECT
+                i.issue_id,
+                i.detected_issue,
+                i.status,
+                i.location_text,
+                i.created_at,
+                i.image1_path,
+                i.image2_path,
+                i.citizen_email IS DISTINCT FROM %s AS merged
+            FROM issues i
+            WHERE i.issue_id = %s
+              AND (i.citizen_email = %s OR ({MERGED_INTO}))
+        """, (citizen_email, issue_id, citizen_email, citizen_email, citizen_email))
+
+        issue = cur.fetchone()
 
     if not issue:
         return jsonify({"error": "Complaint not found"}), 404
 
-    return jsonify({
+    return with_etag(jsonify({
         "issue_id": issue["issue_id"],
         "detected_issue": issue["detected_issue"],
         "status": issue["status"],
         "location": issue["location_text"],
         "created_at": issue["created_at"],
-        "image": issue["image1_path"]
-    })
+        "image": issue["image1_path"],
+        "merged": issue["merged"]
+    }), etag, private=True)
 
 
 # -----------------------------
@@ -126,36 +182,80 @@ def delete_issue(issue_id):
     if not citizen_email:
         return jsonify({"error": "Unauthorized"}), 401
 
-    db = get_db()
-    cur = db.cursor()
-
-    cur.execute("""
-        SELECT status
-        FROM issues
-        WHERE issue_id = %s AND citizen_email = %s
-    """, (issue_id, citizen_email))
-
-    row = cur.fetchone()
-    if not row:
-        cur.close()
-        db.close()
-        return jsonify({"error": "Complaint not found"}), 404
-
-    if row[0] != "Pending":
-        cur.close()
-        db.close()
-        return jsonify({
-            "error": "Only pending complaints can be withdrawn"
-        }), 400
-
-    cur.execute("""
-        DELETE FROM issues
-        WHERE issue_id = %s AND citizen_email = %s
-    """, (issue_id, citizen_email))
-
-    db.commit()
-    cur.close()
-    db.close()
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            SELECT status, detected_issue, assigned_department, created_at::date,
+                   latitude, longitude, citizen_email
+            FROM issues
+            WHERE issue_id = %s
+            FOR UPDATE
+        """, (issue_id,))
+
+        row = cur.fetchone()
+        if row and row[6] != citizen_email:
+            # A "+1" merged into someone else's complaint: withdraw just that
+            cur.execute("""
+                DELETE FROM issue_reports
+                WHERE issue_id = %s AND citizen_email = %s
+            """, (issue_id, citizen_email))
+            withdrawn = cur.rowcount
+            if withdrawn:
+                cur.execute("""
+                    UPDATE issues
+                    SET duplicate_count = GREATEST(duplicate_count - %s, 0)
+                    WHERE issue_id = %s
+                """, (withdrawn, issue_id))
+                touch_issues(cur, [issue_id])
+                return jsonify({"message": "Report withdrawn successfully"})
+            row = None
+
+        if not row:
+            return jsonify({"error": "Complaint not found"}), 404
+
+        if row[0] != "Pending":
+            return jsonify({
+                "error": "Only pending complaints can be withdrawn"
+            }), 400
+
+        # Others reported the same problem: the complaint passes to the
+        # earliest of them rather than taking their reports down with it
+        cur.execute("""
+            DELETE FROM issue_reports
+            WHERE report_id = (
+                SELECT report_id
+                FROM issue_reports
+                WHERE issue_id = %s
+                ORDER BY created_at, report_id
+                LIMIT 1
+            )
+            RETURNING citizen_name, citizen_email, description, image1_path, image2_path
+        """, (issue_id,))
+        heir = cur.fetchone()
+
+        if heir:
+            cur.execute("""
+                UPDATE issues
+                SET citizen_name = %s,
+                    citizen_email = %s,
+                    description = %s,
+                    image1_path = COALESCE(%s, image1_path),
+                    image2_path = COALESCE(%s, image2_path),
+                    duplicate_count = GREATEST(duplicate_count - 1, 0)
+                WHERE issue_id = %s
+            """, heir + (issue_id,))
+            touch_issues(cur, [issue_id])
+            return jsonify({
+                "message": "Complaint withdrawn; it stays open for the other citizens who reported it"
+            })
+
+        cur.execute("""
+            DELETE FROM issues
+            WHERE issue_id = %s AND citizen_email = %s
+        """, (issue_id, citizen_email))
+
+        bump_counter(cur, row[1], row[0], row[2], row[3], -1)
+        bump_tiles(cur, [(row[1], row[0], row[4], row[5], -1)])
+        touch_issues(cur, [issue_id])
 
     return jsonify({"message": "Complaint withdrawn successfully"})
 
@@ -191,29 +291,44 @@ def report_issue():
     if photo2 and not allowed_file(photo2.filename):
         return jsonify({"error": "Invalid image type"}), 400
 
+    if REPORT_ASYNC or request.form.get("async") == "1":
+        job_id = new_job_id()
+        payload = {
+            "predicted_issue": predicted_issue,
+            "confidence": confidence,
+            "severity_score": severity_score,
+            "description": description,
+            "location": location,
+            "lat": lat,
+            "lng": lng,
+            "citizen_name": citizen_name,
+            "citizen_email": citizen_email,
+            "merge": request.form.get("force_new") != "1"
+        }
+        uploads = {}
+        for field, photo in (("photo_1", photo1), ("photo_2", photo2)):
+            if photo:
+                uploads[field] = (photo.filename.rsplit(".", 1)[1].lower(), photo.read())
+                photo.stream.close()
+
+        enqueue(job_id, payload, citizen_email, uploads)
+        report_workers.notify()
+
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/report-issue/{job_id}"
+        }), 202
+
     exif_verified = False
     exif_reason = "EXIF missing or invalid"
+    phash = None
 
     if photo1:
         try:
             img = Image.open(photo1)
-            exif_dict = piexif.load(img.info.get("exif", b""))
-            gps = exif_dict["GPS"]
-
-            img_lat = dms_to_decimal(gps[2], gps[1].decode())
-            img_lng = dms_to_decimal(gps[4], gps[3].decode())
-
-            distance = get_distance_m(img_lat, img_lng, float(lat), float(lng))
-
-            img_time_raw = exif_dict["Exif"].get(piexif.ExifIFD.DateTimeOriginal)
-            if img_time_raw:
-                img_time = datetime.strptime(
-                    img_time_raw.decode(),
-                    "%Y:%m:%d %H:%M:%S"
-                )
-                if distance <= 200 and datetime.now() - img_time <= timedelta(days=7):
-                    exif_verified = True
-                    exif_reason = "Verified"
+            phash = image_phash(img, draft=True)
+            exif_verified, exif_reason = verify_exif(img.info.get("exif", b""), lat, lng)
         except Exception:
             pass
 
@@ -222,11 +337,190 @@ def report_issue():
     img1_path = save_image(photo1) if photo1 else None
     img2_path = save_image(photo2) if photo2 else None
 
-    dept = get_department(predicted_issue)
+    dept = get_department(predicted_issue, description)
+
+    issue_id, duplicate = insert_issue(
+        predicted_issue, confidence, severity_score, description, location,
+        lat, lng, img1_path, img2_path, citizen_name, citizen_email, dept,
+        exif_verified, exif_reason,
+        image_phash=phash, merge=request.form.get("force_new") != "1"
+    )
+
+    return jsonify(report_result(
+        issue_id, predicted_issue, dept, severity_score, duplicate
+    ))
+
+
+# -----------------------------
+# REPORT JOB STATUS (ASYNC MODE)
+# -----------------------------
+
+@user_bp.route("/report-issue/<job_id>", methods=["GET"])
+def report_job_status(job_id):
+    job = get_job(job_id, session.get("email"))
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+
+    return jsonify(job)
+
+
+def process_report_job(job_id, payload, attempt):
+    lat = payload["lat"]
+    lng = payload["lng"]
+    uploads = load_uploads(job_id)
+
+    exif_verified = False
+    exif_reason = "EXIF missing or invalid"
+    img1_path = img2_path = None
+    phash = None
+
+    photo1 = uploads.get("photo_1")
+    img = None
+    if photo1:
+        set_stage(job_id, "exif")
+        ext, data = photo1
+
+        try:
+            img = Image.open(io.BytesIO(data))
+            phash = image_phash(img)
+            exif_verified, exif_reason = verify_exif(img.info.get("exif", b""), lat, lng)
+        except Exception:
+            pass
+
+    predicted_issue = payload["predicted_issue"]
+    dept = get_department(predicted_issue, payload["description"])
+
+    # The stored copies are written before the transaction: if it fails,
+    # remove them, the retry stores its own
+    try:
+        if photo1:
+            set_stage(job_id, "store")
+            img1_path = store_image(data, ext, img)
+
+        photo2 = uploads.get("photo_2")
+        if photo2:
+            ext, data = photo2
+            img2_path = store_image(data, ext)
+
+        set_stage(job_id, "insert")
+
+        # Issue row and job completion commit together
+        with db_cursor(commit=True) as cur:
+            issue_id, duplicate = file_issue_with(
+                cur, predicted_issue, payload["confidence"],
+                payload["severity_score"], payload["description"],
+                payload["location"], lat, lng, img1_path, img2_path,
+                payload["citizen_name"], payload["citizen_email"], dept,
+                exif_verified, exif_reason,
+                image_phash=phash, merge=payload.get("merge", True)
+            )
+            complete_job(cur, job_id, attempt, report_result(
+                issue_id, predicted_issue, dept, payload["severity_score"], duplicate
+            ))
+    except Exception:
+        remove_stored(img1_path, img2_path)
+        raise
+
+
+report_workers = JobWorkers(process_report_job)
+
+if REPORT_ASYNC:
+    # Pick up jobs left queued by a previous process as soon as we serve
+    user_bp.before_app_request(report_workers.ensure_started)
+
+
+# -----------------------------
+# REPORT HELPERS
+# -----------------------------
+
+def report_result(issue_id, predicted_issue, dept, severity_score, duplicate=None):
+    result = {
+        "complaint_id": f"#CN-{issue_id}",
+        "detected_issue": predicted_issue,
+        "assigned_to": {
+            "department": duplicate["assigned_department"] if duplicate else dept,
+            "officer": "Municipal Officer",
+            "priority": "High" if float(severity_score) > 0.7 else "Normal"
+        }
+    }
+
+    # Merged into an existing open complaint as a "+1"
+    if duplicate:
+        result["duplicate"] = {
+            "distance_m": duplicate["distance_m"],
+            "phash_distance": duplicate["phash_distance"],
+            "reports": duplicate["reports"]
+        }
+
+    return result
 
-    db = get_db()
-    cur = db.cursor()
 
+def image_phash(img, draft=False):
+    # draft: the caller is done with img, so a JPEG may be decoded at 1/8
+    # scale; an 8x9 hash doesn't need the full-resolution pixels.
+    try:
+        if draft:
+            img.draft("L", (img.width // 8, img.height // 8))
+        return perceptual_hash(img)
+    except Exception:
+        return None
+
+
+def verify_exif(exif_bytes, lat, lng):
+    # Photo GPS within 200 m of the reported spot, taken in the last 7 days
+    exif_dict = piexif.load(exif_bytes)
+    gps = exif_dict["GPS"]
+
+    img_lat = dms_to_decimal(gps[2], gps[1].decode())
+    img_lng = dms_to_decimal(gps[4], gps[3].decode())
+
+    distance = get_distance_m(img_lat, img_lng, float(lat), float(lng))
+
+    img_time_raw = exif_dict["Exif"].get(piexif.ExifIFD.DateTimeOriginal)
+    if img_time_raw:
+        img_time = datetime.strptime(
+            img_time_raw.decode(),
+            "%Y:%m:%d %H:%M:%S"
+        )
+        if distance <= 200 and datetime.now() - img_time <= timedelta(days=7):
+            return True, "Verified"
+
+    return False, "EXIF missing or invalid"
+
+
+def insert_issue(*fields, **options):
+    with db_cursor(commit=True) as cur:
+        return file_issue_with(cur, *fields, **options)
+
+
+def file_issue_with(cur, predicted_issue, confidence, severity_score,
+                    description, location, lat, lng, img1_path, img2_path,
+                    citizen_name, citizen_email, dept, exif_verified,
+                    exif_reason, image_phash=None, merge=True):
+    # Returns (issue_id, duplicate). duplicate is the open issue this report
+    # was merged into, or None when a new row was inserted.
+    if merge and DEDUP_ENABLED:
+        lock_area(cur, predicted_issue, float(lat), float(lng), image_phash)
+        match = find_duplicate(cur, predicted_issue, float(lat), float(lng), image_phash)
+        if match:
+            attach_report(
+                cur, match["issue_id"], citizen_name, citizen_email,
+                description, lat, lng, img1_path, img2_path, match
+            )
+            return match["issue_id"], match
+
+    issue_id = insert_issue_with(
+        cur, predicted_issue, confidence, severity_score, description,
+        location, lat, lng, img1_path, img2_path, citizen_name,
+        citizen_email, dept, exif_verified, exif_reason, image_phash
+    )
+    return issue_id, None
+
+
+def insert_issue_with(cur, predicted_issue, confidence, severity_score,
+                      description, location, lat, lng, img1_path, img2_path,
+                      citizen_name, citizen_email, dept, exif_verified,
+                      exif_reason, image_phash=None):
     cur.execute("""
         INSERT INTO issues (
             detected_issue,
@@ -243,10 +537,12 @@ def report_issue():
             assigned_department,
             exif_verified,
             exif_reason,
+            grid_cell,
+            image_phash,
             status
         )
-        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
-        RETURNING issue_id
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        RETURNING issue_id, created_at::date
     """, (
         predicted_issue,
         confidence,
@@ -262,20 +558,114 @@ def report_issue():
         dept,
         exif_verified,
         exif_reason,
+        grid_cell(float(lat), float(lng)),
+        to_signed(image_phash),
         "Pending"
     ))
 
-    issue_id = cur.fetchone()[0]
-    db.commit()
-    cur.close()
-    db.close()
+    issue_id, day = cur.fetchone()
 
-    return jsonify({
-        "complaint_id": f"#CN-{issue_id}",
-        "detected_issue": predicted_issue,
-        "assigned_to": {
-            "department": dept,
-            "officer": "Municipal Officer",
-            "priority": "High" if float(severity_score) > 0.7 else "Normal"
-        }
+    bump_counter(cur, predicted_issue, "Pending", dept, day, 1)
+    bump_tiles(cur, [(predicted_issue, "Pending", lat, lng, 1)])
+    touch_issues(cur, [issue_id])
+
+    return issue_id
+
+
+# -----------------------------
+# ANALYZE + REPORT (ONE UPLOAD, ONE DECODE)
+# -----------------------------
+
+@user_bp.route("/submit-issue", methods=["POST"])
+def submit_issue():
+    started = time.perf_counter()
+    timings = {}
+
+    def lap(stage, since):
+        now = time.perf_counter()
+        timings[stage] = round((now - since) * 1000, 2)
+        return now
+
+    citizen_name = session.get("user_name")
+    citizen_email = session.get("email")
+
+    description = request.form.get("description")
+    location = request.form.get("location")
+    lat = request.form.get("lat")
+    lng = request.form.get("lng")
+
+    if not lat or not lng:
+        return jsonify({"error": "Location missing"}), 400
+
+    try:
+        lat, lng = float(lat), float(lng)
+    except ValueError:
+        return jsonify({"error": "Invalid coordinates"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return jsonify({"error": "Invalid coordinates"}), 400
+
+    photo1 = request.files.get("photo_1")
+    photo2 = request.files.get("photo_2")
+
+    if not photo1 or not allowed_file(photo1.filename):
+        return jsonify({"error": "Invalid image type"}), 400
+    if photo2 and not allowed_file(photo2.filename):
+        return jsonify({"error": "Invalid image type"}), 400
+
+    # Read once: every stage below works from this buffer
+    data = photo1.read()
+    photo1.stream.close()
+    t = lap("read", started)
+
+    # Header only: the model decodes its own reduced-scale copy, and only
+    # storing the photo needs the full-resolution pixels
+    try:
+        img = Image.open(io.BytesIO(data))
+    except Exception:
+        return jsonify({"error": "Could not read image"}), 400
+    t = lap("open", t)
+
+    try:
+        ml, phash = classify_with_phash(data)
+    except ModelNotReady:
+        return jsonify({"error": "Model is still loading, please retry"}), 503
+    except BatcherFull:
+        return jsonify({"error": "Prediction service busy, please retry"}), 503
+    except FutureTimeout:
+        return jsonify({"error": "Prediction timed out"}), 504
+    except OSError:
+        # Header parsed but the pixel data doesn't decode
+        return jsonify({"error": "Could not read image"}), 400
+    t = lap("classify", t)
+
+    try:
+        exif_verified, exif_reason = verify_exif(img.info.get("exif", b""), lat, lng)
+    except Exception:
+        exif_verified, exif_reason = False, "EXIF missing or invalid"
+    t = lap("exif", t)
+
+    img1_path = store_image(data, photo1.filename.rsplit(".", 1)[1].lower(), img)
+    img2_path = save_image(photo2) if photo2 else None
+    t = lap("store", t)
+
+    predicted_issue = ml["prediction"]
+    severity_score = ml["severity_score"]
+    dept = get_department(predicted_issue, description)
+
+    issue_id, duplicate = insert_issue(
+        predicted_issue, ml["confidence"], severity_score, description,
+        location, str(lat), str(lng), img1_path, img2_path, citizen_name,
+        citizen_email, dept, exif_verified, exif_reason,
+        image_phash=phash, merge=request.form.get("force_new") != "1"
+    )
+    t = lap("insert", t)
+    timings["total"] = round((t - started) * 1000, 2)
+
+    result = report_result(issue_id, predicted_issue, dept, severity_score, duplicate)
+    result.update({
+        "confidence": ml["confidence"],
+        "severity_score": severity_score,
+        "exif_verified": exif_verified,
+        "timings_ms": timings
     })
+    return jsonify(result)
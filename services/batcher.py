@@ -0,0 +1,143 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class BatcherFull(Exception):
+    pass
+
+
+# -----------------------------
+# MICRO-BATCHING SCHEDULER
+# -----------------------------
+# Callers submit one input each; a single worker thread waits up to
+# window_ms (or until max_batch inputs are queued), runs one batched call
+# and hands every caller back its own row of the output.
+
+class MicroBatcher:
+    def __init__(self, run_batch, max_batch=16, window_ms=5.0, max_queue=256):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.window = window_ms / 1000.0
+        self.max_queue = max_queue
+
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._rejected = 0
+        self._errors = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._histogram = [0] * (max_batch + 1)
+
+        # Batch input array, reused while the input shape stays the same
+        self._buffer = None
+
+    def _ensure_worker(self):
+        # One worker per process; gunicorn forks do not inherit threads
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._queue = queue.Queue(maxsize=self.max_queue)
+            self._thread = threading.Thread(
+                target=self._loop, name="predict-batcher", daemon=True
+            )
+            self._thread.start()
+            self._pid = pid
+
+    def submit(self, item):
+        self._ensure_worker()
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.monotonic()))
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            raise BatcherFull("Prediction queue is full")
+        return future
+
+    def __call__(self, item, timeout=None):
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+
+            futures = [future for _, future, _ in batch]
+            try:
+                outputs = self.run_batch(self._stack([item for item, _, _ in batch]))
+                for future, output in zip(futures, outputs):
+                    future.set_result(output)
+                failed = False
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                failed = True
+
+            finished = time.monotonic()
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._histogram[len(batch)] += 1
+                self._wait_total += sum(started - queued for _, _, queued in batch)
+                self._run_total += finished - started
+                if failed:
+                    self._errors += 1
+
+    def _stack(self, items):
+        first = np.asarray(items[0])
+        buf = self._buffer
+        if buf is None or buf.shape[1:] != first.shape or buf.dtype != first.dtype:
+            buf = self._buffer = np.empty((self.max_batch,) + first.shape, dtype=first.dtype)
+        # run_batch only reads the rows; nothing keeps a reference past the call
+        return np.stack(items, out=buf[:len(items)])
+
+    def stats(self):
+        with self._stats_lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "max_batch": self.max_batch,
+                "window_ms": self.window * 1000,
+                "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+                "batches": batches,
+                "items": items,
+                "rejected": self._rejected,
+                "errors": self._errors,
+                "avg_batch_size": round(items / batches, 3) if batches else 0.0,
+                "avg_queue_wait_ms": round(self._wait_total / items * 1000, 3) if items else 0.0,
+                "avg_batch_run_ms": round(self._run_total / batches * 1000, 3) if batches else 0.0,
+                "batch_size_histogram": {
+                    str(size): count
+                    for size, count in enumerate(self._histogram)
+                    if count
+                },
+            }
@@ -0,0 +1,148 @@
+import math
+import os
+
+from services.prediction_cache import phash_distance
+from utils.geo_utils import (
+    EARTH_RADIUS_M, get_distance_m, grid_cell_id, grid_cell_ranges, grid_spans
+)
+
+# -----------------------------
+# DEDUP CONFIG
+# -----------------------------
+DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "1") == "1"
+# Same type this close: the same problem, whatever the photo shows
+DEDUP_RADIUS_M = float(os.getenv("DEDUP_RADIUS_M", "25"))
+# Further out (up to this), only when the photos look alike too
+DEDUP_IMAGE_RADIUS_M = float(os.getenv("DEDUP_IMAGE_RADIUS_M", "100"))
+# Max differing bits (of 64) between the two photos' dHashes
+DEDUP_PHASH_DISTANCE = int(os.getenv("DEDUP_PHASH_DISTANCE", "10"))
+DEDUP_MAX_RADIUS_M = max(DEDUP_RADIUS_M, DEDUP_IMAGE_RADIUS_M)
+
+_SIGN = 1 << 63
+
+
+def to_signed(phash):
+    # dHash is unsigned 64-bit; Postgres BIGINT is signed
+    if phash is None:
+        return None
+    return phash - (1 << 64) if phash >= _SIGN else phash
+
+
+# -----------------------------
+# SUBMISSION LOCKS
+# -----------------------------
+# Two reports of one pothole arriving together would otherwise both miss
+# and both insert. Each submission locks every coarse cell its search
+# circle touches, in sorted order, until the transaction ends. Reports
+# close enough to merge always share a lock: each one's circle covers the
+# other's own cell.
+DEDUP_LOCK_CELL_DEG = 0.01
+# Rows where a search circle can span more columns than this (near the
+# poles) are locked as a whole
+DEDUP_LOCK_ROW_MAX_COLS = 16
+
+_LOCK_HALF_ROWS = round(90 / DEDUP_LOCK_CELL_DEG)
+_LOCK_ROW_KEY_BASE = grid_cell_id(_LOCK_HALF_ROWS + 1, 0, DEDUP_LOCK_CELL_DEG)
+
+
+def search_radius(phash=None):
+    return max(DEDUP_RADIUS_M, DEDUP_IMAGE_RADIUS_M if phash is not None else 0)
+
+
+def _whole_row(row):
+    # Depends only on the row, so every submission agrees on the key type
+    edge = min(90.0, max(abs(row), abs(row + 1)) * DEDUP_LOCK_CELL_DEG)
+    angle = DEDUP_MAX_RADIUS_M / EARTH_RADIUS_M
+    cos_edge = math.cos(math.radians(edge))
+    if math.sin(angle) >= cos_edge:
+        return True
+    dlng = math.degrees(math.asin(math.sin(angle) / cos_edge))
+    return 2 * dlng / DEDUP_LOCK_CELL_DEG + 2 > DEDUP_LOCK_ROW_MAX_COLS
+
+
+def lock_keys(lat, lng, radius):
+    keys = set()
+    for row, lo, hi in grid_spans(lat, lng, radius, DEDUP_LOCK_CELL_DEG):
+        if _whole_row(row):
+            keys.add(_LOCK_ROW_KEY_BASE + row + _LOCK_HALF_ROWS)
+        else:
+            keys.update(grid_cell_id(row, col, DEDUP_LOCK_CELL_DEG) for col in range(lo, hi + 1))
+    return sorted(keys)
+
+
+def lock_area(cur, detected_issue, lat, lng, phash=None):
+    # Locks are taken one at a time in key order, so overlapping
+    # submissions queue instead of deadlocking
+    for key in lock_keys(lat, lng, search_radius(phash)):
+        cur.execute(
+            "SELECT pg_advisory_xact_lock(hashtext(%s), %s)",
+            (detected_issue or "", key)
+        )
+
+
+def candidates_query(detected_issue, lat, lng, radius):
+    # (sql, params), also EXPLAINed by migrations/check_indexes.py
+    ranges = grid_cell_ranges(lat, lng, radius)
+    return """
+        SELECT i.issue_id, i.latitude, i.longitude, i.image_phash, i.assigned_department
+        FROM unnest(%s::bigint[], %s::bigint[]) AS r (lo, hi)
+        JOIN issues i
+          ON i.grid_cell BETWEEN r.lo AND r.hi
+        WHERE i.detected_issue = %s
+          AND i.status <> 'Resolved'
+    """, ([lo for lo, _ in ranges], [hi for _, hi in ranges], detected_issue)
+
+
+def find_duplicate(cur, detected_issue, lat, lng, phash=None):
+    radius = search_radius(phash)
+    cur.execute(*candidates_query(detected_issue, lat, lng, radius))
+
+    best = None
+    for issue_id, other_lat, other_lng, other_phash, dept in cur.fetchall():
+        distance = get_distance_m(lat, lng, float(other_lat), float(other_lng))
+        if distance > radius:
+            continue
+
+        bits = None
+        if phash is not None and other_phash is not None:
+            bits = phash_distance(phash, other_phash)
+
+        similar = bits is not None and bits <= DEDUP_PHASH_DISTANCE
+        if distance > DEDUP_RADIUS_M and not similar:
+            continue
+
+        # Prefer a matching photo, then the closest issue
+        rank = (not similar, distance)
+        if best is None or rank < best[0]:
+            best = (rank, {
+                "issue_id": issue_id,
+                "assigned_department": dept,
+                "distance_m": round(distance, 1),
+                "phash_distance": bits,
+            })
+
+    return best[1] if best else None
+
+
+def attach_report(cur, issue_id, citizen_name, citizen_email, description,
+                  lat, lng, img1_path, img2_path, match):
+    cur.execute("""
+        INSERT INTO issue_reports (
+            issue_id, citizen_name, citizen_email, description,
+            latitude, longitude, image1_path, image2_path,
+            distance_m, phash_distance
+        )
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    """, (
+        issue_id, citizen_name, citizen_email, description, lat, lng,
+        img1_path, img2_path, match["distance_m"], match["phash_distance"]
+    ))
+
+    cur.execute("""
+        UPDATE issues
+        SET duplicate_count = duplicate_count + 1
+        WHERE issue_id = %s
+        RETURNING duplicate_count
+    """, (issue_id,))
+    # The original report plus every merged one
+    match["reports"] = cur.fetchone()[0] + 1
@@ -1,9 +1,215 @@
-def get_department(issue):
-    issue = issue.lower()
-
-    if "pothole" in issue:
-        return "road Maintenance"
-    elif "garbage" in issue:
-        return "sanitation"
-    else:
-        return "general services"
\ No newline at end of file
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+from psycopg2.extras import execute_values
+
+from routes.counters import bump_counters
+from routes.db import db_cursor
+from services.issue_versions import touch_all
+
+# -----------------------------
+# DEPARTMENT ROUTING
+# -----------------------------
+# Rules from department_rules.json. First hit wins: exact model class,
+# then keyword in the label, then description term, then the default;
+# within a step, earlier rules win. After editing the rules:
+#   python -m services.department_mapper --reroute [--dry-run]
+
+DEPARTMENT_RULES_PATH = os.getenv("DEPARTMENT_RULES_PATH", "department_rules.json")
+REROUTE_BATCH = int(os.getenv("REROUTE_BATCH", "5000"))
+
+DEFAULT_RULES = {
+    "default": "general services",
+    "rules": [
+        {"department": "road Maintenance", "classes": ["pothole"], "keywords": ["pothole"]},
+        {"department": "sanitation", "classes": ["garbage"], "keywords": ["garbage"]},
+    ],
+}
+
+
+# -----------------------------
+# COMPILED RULES
+# -----------------------------
+
+def _alternation(terms_by_rule, word_boundary):
+    # One regex for every rule: group rN matches rule N's terms. Longest
+    # terms first so "burst pipe" is preferred over "pipe" at one position.
+    parts = []
+    for index, terms in terms_by_rule:
+        if not terms:
+            continue
+        escaped = "|".join(re.escape(t.lower()) for t in sorted(terms, key=len, reverse=True))
+        if word_boundary:
+            escaped = rf"\b(?:{escaped})\b"
+        parts.append(f"(?P<r{index}>{escaped})")
+    return re.compile("|".join(parts)) if parts else None
+
+
+class DepartmentRouter:
+    def __init__(self, table):
+        self.default = table.get("default") or DEFAULT_RULES["default"]
+        self.departments = [rule["department"] for rule in table["rules"]]
+
+        self._classes = {}
+        for index, rule in enumerate(table["rules"]):
+            for cls in rule.get("classes", []):
+                self._classes.setdefault(cls.lower(), index)
+
+        indexed = list(enumerate(table["rules"]))
+        self._keywords = _alternation(
+            [(i, rule.get("keywords", [])) for i, rule in indexed], word_boundary=False
+        )
+        self._terms = _alternation(
+            [(i, rule.get("description_terms", [])) for i, rule in indexed], word_boundary=True
+        )
+
+    @classmethod
+    def from_file(cls, path):
+        if not os.path.exists(path):
+            return cls(DEFAULT_RULES)
+        with open(path) as f:
+            return cls(json.load(f))
+
+    @staticmethod
+    def _best(pattern, text):
+        # Lowest rule index among all matches, not just the leftmost match
+        best = None
+        for match in pattern.finditer(text):
+            index = int(match.lastgroup[1:])
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+        return best
+
+    def route(self, issue, description=None):
+        issue = (issue or "").strip().lower()
+
+        index = self._classes.get(issue)
+        if index is None and issue and self._keywords is not None:
+            index = self._best(self._keywords, issue)
+        if index is None and description and self._terms is not None:
+            index = self._best(self._terms, description.lower())
+
+        return self.default if index is None else self.departments[index]
+
+
+_router = DepartmentRouter.from_file(DEPARTMENT_RULES_PATH)
+
+
+def get_router():
+    return _router
+
+
+def reload_rules(path=DEPARTMENT_RULES_PATH):
+    global _router
+    _router = DepartmentRouter.from_file(path)
+    return _router
+
+
+def get_department(issue, description=None):
+    return _router.route(issue, description)
+
+
+# -----------------------------
+# BATCH RE-ROUTING
+# -----------------------------
+# One keyset scan over issues by primary key; each batch of changed rows is
+# a single UPDATE ... FROM (VALUES ...) committed with its counter moves.
+# The UPDATE only touches rows still on the department we read, so a
+# concurrent status change or re-route is never overwritten.
+
+def reroute_issues(router=None, batch_size=REROUTE_BATCH, dry_run=False, out=None):
+    router = router or _router
+    scanned = changed = 0
+    moves = Counter()
+    last_id = 0
+
+    while True:
+        with db_cursor(commit=not dry_run) as cur:
+            cur.execute("""
+                SELECT issue_id, detected_issue, description, assigned_department
+                FROM issues
+                WHERE issue_id > %s
+                ORDER BY issue_id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cur.fetchall()
+            if not rows:
+                break
+
+            last_id = rows[-1][0]
+            scanned += len(rows)
+
+            updates = []
+            for issue_id, issue, description, old in rows:
+                new = router.route(issue, description)
+                if new != old:
+                    updates.append((issue_id, new, old))
+
+            if not updates:
+                continue
+
+            if dry_run:
+                changed += len(updates)
+                moves.update(f"{old} -> {new}" for _, new, old in updates)
+                continue
+
+            moved = execute_values(cur, """
+                UPDATE issues AS i
+                SET assigned_department = v.dept
+                FROM (VALUES %s) AS v (issue_id, dept, old_dept)
+                WHERE i.issue_id = v.issue_id
+                  AND i.assigned_department IS NOT DISTINCT FROM v.old_dept
+                RETURNING i.detected_issue, i.status, v.old_dept, v.dept,
+                          i.created_at::date
+            """, updates, page_size=len(updates), fetch=True)
+
+            # One collection-wide notification per batch, not one per
+            # row: a large re-route would otherwise flood the listeners
+            if moved:
+                touch_all(cur)
+            counts = []
+            for issue, status, old, new, day in moved:
+                counts.append((issue, status, old, day, -1))
+                counts.append((issue, status, new, day, 1))
+                moves[f"{old} -> {new}"] += 1
+            bump_counters(cur, counts)
+            changed += len(moved)
+
+        if out:
+            out(f"scanned {scanned}, re-routed {changed}")
+
+    return {"scanned": scanned, "changed": changed, "moves": dict(moves)}
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Department routing rules")
+    parser.add_argument("--reroute", action="store_true",
+                        help="re-apply the rules to every existing issue")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=REROUTE_BATCH)
+    parser.add_argument("--rules", default=DEPARTMENT_RULES_PATH)
+    args = parser.parse_args(argv)
+
+    router = DepartmentRouter.from_file(args.rules)
+    if not args.reroute:
+        print(f"default: {router.default}")
+        for department in router.departments:
+            print(f"rule:    {department}")
+        return 0
+
+    result = reroute_issues(router, args.batch_size, args.dry_run, out=print)
+    for move, count in sorted(result["moves"].items()):
+        print(f"{count:>10}  {move}")
+    print(f"{'would re-route' if args.dry_run else 're-routed'} "
+          f"{result['changed']} of {result['scanned']} issues")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,231 @@
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from services.batcher import BatcherFull
+from services.model_manager import ModelNotReady
+
+# -----------------------------
+# INFERENCE SERVICE CONFIG
+# -----------------------------
+# Set INFERENCE_SOCKET to have web workers call the model process
+# (python -m services.inference_server) instead of loading TensorFlow.
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "30"))
+INFERENCE_CONNECT_TIMEOUT = float(os.getenv("INFERENCE_CONNECT_TIMEOUT", "0.5"))
+# After a failed connect, skip the service for this long (fallback or 503)
+INFERENCE_RETRY_SECONDS = float(os.getenv("INFERENCE_RETRY_SECONDS", "2"))
+# none: 503 while the service is down. local: load the model in-process.
+INFERENCE_FALLBACK = os.getenv("INFERENCE_FALLBACK", "none")
+# How long a worker trusts the model version it last saw (cache keys)
+INFERENCE_VERSION_TTL = float(os.getenv("INFERENCE_VERSION_TTL", "5"))
+
+
+class InferenceUnavailable(ModelNotReady):
+    pass
+
+
+# -----------------------------
+# WIRE PROTOCOL
+# -----------------------------
+# Request:  magic "CI", protocol version, op, payload length, payload
+# Response: status, payload length, payload
+#
+# PREDICT payload: height, width, channels (uint16 each) and the uint8
+# RGB pixels, already resized to the model input (150 KB at 224x224).
+# The reply is confidence (float32), then the label and model version as
+# UTF-8 with uint16 length prefixes. STATUS / STATS / RELOAD reply with JSON.
+
+MAGIC = b"CI"
+PROTOCOL_VERSION = 2
+
+REQUEST = struct.Struct("!2sBBI")
+RESPONSE = struct.Struct("!BI")
+PIXELS = struct.Struct("!HHH")
+PREDICTION = struct.Struct("!fHH")
+
+OP_PREDICT = 1
+OP_STATUS = 2
+OP_STATS = 3
+OP_RELOAD = 4
+
+OK = 0
+NOT_READY = 1
+BUSY = 2
+TIMEOUT = 3
+BAD_REQUEST = 4
+NOT_FOUND = 5
+ERROR = 6
+
+# Largest payload either side accepts (a 1024x1024 RGB frame)
+MAX_PAYLOAD = 1024 * 1024 * 3 + PIXELS.size
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:])
+        if n == 0:
+            raise ConnectionError("connection closed")
+        got += n
+    return bytes(buf)
+
+
+def send_frame(sock, header, payload=b""):
+    sock.sendall(header)
+    if payload:
+        sock.sendall(payload)
+
+
+def encode_prediction(label, confidence, version):
+    label = label.encode()
+    version = version.encode()
+    if len(label) > 0xFFFF or len(version) > 0xFFFF:
+        raise ProtocolError("label or model version too long to encode")
+    return PREDICTION.pack(confidence, len(label), len(version)) + label + version
+
+
+def decode_prediction(body):
+    confidence, label_len, version_len = PREDICTION.unpack_from(body)
+    offset = PREDICTION.size
+    if len(body) != offset + label_len + version_len:
+        raise ProtocolError("malformed prediction reply")
+    label = body[offset:offset + label_len].decode()
+    version = body[offset + label_len:offset + label_len + version_len].decode()
+    return label, confidence, version
+
+
+# -----------------------------
+# CLIENT
+# -----------------------------
+# One connection per web-worker thread, reused across requests. Errors map
+# onto the exceptions the in-process path already raises, so callers
+# handle both the same way.
+
+class InferenceClient:
+    def __init__(self, path, timeout=INFERENCE_TIMEOUT,
+                 connect_timeout=INFERENCE_CONNECT_TIMEOUT):
+        self.path = path
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+
+        self._local = threading.local()
+        self._down_until = 0.0
+        self._version = None
+        self._version_at = 0.0
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self.connect_timeout)
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            self._down_until = time.monotonic() + INFERENCE_RETRY_SECONDS
+            raise InferenceUnavailable(f"inference service at {self.path} unreachable")
+        sock.settimeout(self.timeout)
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+
+    def _call(self, op, payload=b""):
+        if time.monotonic() < self._down_until:
+            raise InferenceUnavailable("inference service recently unreachable")
+
+        # A kept connection may have been closed by a server restart: one
+        # retry on a fresh one
+        for attempt in range(2):
+            sock = getattr(self._local, "sock", None)
+            reused = sock is not None
+            if sock is None:
+                sock = self._local.sock = self._connect()
+            try:
+                send_frame(sock, REQUEST.pack(MAGIC, PROTOCOL_VERSION, op, len(payload)), payload)
+                status, length = RESPONSE.unpack(recv_exact(sock, RESPONSE.size))
+                if length > MAX_PAYLOAD:
+                    raise ProtocolError(f"response of {length} bytes")
+                return status, recv_exact(sock, length)
+            except socket.timeout:
+                # The late reply would desync this connection
+                self._close()
+                raise FutureTimeout()
+            except (OSError, ProtocolError):
+                self._close()
+                if not reused or attempt:
+                    raise InferenceUnavailable("inference service connection failed")
+
+    def _raise_for(self, status, body):
+        message = body.decode(errors="replace")
+        if status == NOT_READY:
+            raise ModelNotReady(message)
+        if status == BUSY:
+            raise BatcherFull(message)
+        if status == TIMEOUT:
+            raise FutureTimeout()
+        if status == NOT_FOUND:
+            raise FileNotFoundError(message)
+        raise RuntimeError(f"inference service error: {message}")
+
+    def _json(self, op, payload=b""):
+        status, body = self._call(op, payload)
+        if status != OK:
+            self._raise_for(status, body)
+        return json.loads(body)
+
+    # ---------------- API ----------------
+
+    def predict(self, pixels):
+        # pixels: uint8 HxWx3. Returns (label, confidence, model version).
+        pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+        height, width, channels = pixels.shape
+        payload = PIXELS.pack(height, width, channels) + pixels.tobytes()
+
+        status, body = self._call(OP_PREDICT, payload)
+        if status != OK:
+            self._raise_for(status, body)
+
+        try:
+            label, confidence, version = decode_prediction(body)
+        except (ProtocolError, struct.error, UnicodeDecodeError):
+            raise InferenceUnavailable("malformed reply from inference service")
+        self._version, self._version_at = version, time.monotonic()
+        return label, confidence, version
+
+    def version(self):
+        if self._version is None or time.monotonic() - self._version_at > INFERENCE_VERSION_TTL:
+            status = self.status()
+            if not status.get("ready"):
+                raise ModelNotReady(status.get("state", "unloaded"))
+            self._version, self._version_at = status["version"], time.monotonic()
+        return self._version
+
+    def status(self):
+        return self._json(OP_STATUS)
+
+    def stats(self):
+        return self._json(OP_STATS)
+
+    def reload(self, path=None):
+        return self._json(OP_RELOAD, (path or "").encode())
+
+
+inference = InferenceClient(INFERENCE_SOCKET) if INFERENCE_SOCKET else None
@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+from concurrent.futures import TimeoutError as FutureTimeout
+
+import numpy as np
+
+from services.batcher import BatcherFull
+from services.inference import (
+    BAD_REQUEST, BUSY, ERROR, INFERENCE_SOCKET, MAGIC, MAX_PAYLOAD, NOT_FOUND,
+    NOT_READY, OK, OP_PREDICT, OP_RELOAD, OP_STATS, OP_STATUS, PIXELS,
+    PROTOCOL_VERSION, REQUEST, RESPONSE, TIMEOUT, encode_prediction,
+    recv_exact, send_frame
+)
+from services.ml_model import batcher, infer_local, models
+from services.model_manager import ModelNotReady
+from services.preprocess import INPUT_SIZE
+
+# -----------------------------
+# INFERENCE SERVER
+# -----------------------------
+# One process owns the model and batches PREDICT requests from every web
+# worker over a Unix socket (wire format in services/inference.py).
+#   python -m services.inference_server --socket /run/civic/infer.sock
+
+# Group-writable so the web workers' user can connect
+INFERENCE_SOCKET_MODE = int(os.getenv("INFERENCE_SOCKET_MODE", "660"), 8)
+
+
+class BadRequest(Exception):
+    pass
+
+
+# -----------------------------
+# REQUEST HANDLING
+# -----------------------------
+
+def predict(body):
+    if len(body) < PIXELS.size:
+        raise BadRequest("missing pixel header")
+    height, width, channels = PIXELS.unpack_from(body)
+    if (height, width, channels) != (INPUT_SIZE, INPUT_SIZE, 3):
+        raise BadRequest(f"expected {INPUT_SIZE}x{INPUT_SIZE}x3, got {height}x{width}x{channels}")
+    if len(body) != PIXELS.size + height * width * channels:
+        raise BadRequest("pixel data does not match its header")
+
+    pixels = np.frombuffer(body, dtype=np.uint8, offset=PIXELS.size)
+    label, confidence, version = infer_local(pixels.reshape(height, width, channels))
+    return encode_prediction(label, confidence, version)
+
+
+def respond_json(op, body):
+    if op == OP_STATUS:
+        return json.dumps(models.status()).encode()
+    if op == OP_STATS:
+        return json.dumps(batcher.stats()).encode()
+    if op == OP_RELOAD:
+        models.reload(body.decode() or None)
+        return json.dumps(models.status()).encode()
+    raise BadRequest(f"unknown op {op}")
+
+
+def dispatch(op, body):
+    # -> (status, payload)
+    try:
+        if op == OP_PREDICT:
+            return OK, predict(body)
+        return OK, respond_json(op, body)
+    except BadRequest as e:
+        return BAD_REQUEST, str(e).encode()
+    except ModelNotReady as e:
+        return NOT_READY, str(e).encode()
+    except BatcherFull as e:
+        return BUSY, str(e).encode()
+    except FutureTimeout:
+        return TIMEOUT, b"prediction timed out"
+    except FileNotFoundError as e:
+        return NOT_FOUND, str(e).encode()
+    except Exception as e:
+        return ERROR, f"{type(e).__name__}: {e}".encode()
+
+
+class InferenceHandler(socketserver.BaseRequestHandler):
+    # One thread per web-worker connection, many requests per connection
+    def handle(self):
+        sock = self.request
+        while True:
+            try:
+                magic, version, op, length = REQUEST.unpack(recv_exact(sock, REQUEST.size))
+            except ConnectionError:
+                return
+
+            if magic != MAGIC or version != PROTOCOL_VERSION or length > MAX_PAYLOAD:
+                # Can't tell where the next frame starts: drop the connection
+                message = b"unsupported protocol"
+                send_frame(sock, RESPONSE.pack(BAD_REQUEST, len(message)), message)
+                return
+
+            body = recv_exact(sock, length)
+            status, payload = dispatch(op, body)
+            send_frame(sock, RESPONSE.pack(status, len(payload)), payload)
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+# -----------------------------
+# CLI
+# -----------------------------
+
+def serve(path):
+    if os.path.exists(path):
+        # Left over from a previous run; bind() would fail
+        os.unlink(path)
+
+    server = InferenceServer(path, InferenceHandler)
+    os.chmod(path, INFERENCE_SOCKET_MODE)
+
+    # Answer STATUS (not ready) while the model loads
+    models.load_async()
+    print(f"serving {models.path} on {path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.unlink(path)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Inference service on a Unix socket")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET, required=not INFERENCE_SOCKET)
+    args = parser.parse_args(argv)
+
+    try:
+        serve(args.socket)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+
+from flask import current_app, request
+
+from routes.db import after_commit, get_db
+
+# -----------------------------
+# ISSUE VERSIONS (ETag source)
+# -----------------------------
+# Every write to an issue calls touch_issues() in its transaction. That
+# NOTIFYs "<issue_id>:<seq>" (or "*:<seq>" for bulk changes), with seq from
+# one global sequence, and Postgres delivers it on commit. Each worker
+# LISTENs in a background thread and keeps the last seq seen per issue, so
+# request threads can build and compare ETags without a query.
+#
+# An issue this worker hasn't seen change gets the worker's floor: the
+# sequence value when the listener (re)connected. A floor only ever
+# overstates how recent a version is, so it can cost a 200 but never
+# produce a stale 304.
+#
+# Read-your-writes: the worker that made a change applies it itself as
+# soon as the transaction commits (db.after_commit), so its own next
+# request already sees the new version. Other workers lag by the NOTIFY
+# delivery time, normally milliseconds; a client revalidating on another
+# worker inside that window can still get one stale 304.
+
+CHANNEL = "issue_changed"
+VERSIONS_MAX = int(os.getenv("ISSUE_VERSIONS_MAX", "100000"))
+VERSIONS_RETRY_SECONDS = float(os.getenv("ISSUE_VERSIONS_RETRY_SECONDS", "5"))
+
+
+def touch_issues(cur, issue_ids):
+    if not issue_ids:
+        return
+    cur.execute("""
+        SELECT pg_notify(%s, v.payload), v.payload
+        FROM (
+            SELECT id::text || ':' || nextval('issue_version_seq') AS payload
+            FROM unnest(%s::int[]) AS id
+        ) v
+    """, (CHANNEL, list(issue_ids)))
+    _apply_after_commit(cur, [row[-1] for row in cur.fetchall()])
+
+
+def touch_all(cur):
+    cur.execute("""
+        SELECT pg_notify(%s, v.payload), v.payload
+        FROM (SELECT '*:' || nextval('issue_version_seq') AS payload) v
+    """, (CHANNEL,))
+    _apply_after_commit(cur, [row[-1] for row in cur.fetchall()])
+
+
+def _apply_after_commit(cur, payloads):
+    after_commit(cur, lambda: versions.apply_local(payloads))
+
+
+class IssueVersions:
+    def __init__(self, max_entries=VERSIONS_MAX):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._versions = OrderedDict()    # issue_id -> seq
+        self._floor = None                # None until the listener is live
+        self._latest = 0
+        self._out_of_order = 0
+        self._changed_at = time.time()
+        self._pid = None
+
+    # ---------------- LISTENER ----------------
+
+    def ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._floor = None
+            self._versions.clear()
+            threading.Thread(target=self._listen, name="issue-versions", daemon=True).start()
+            self._pid = pid
+
+    def _listen(self):
+        while True:
+            conn = None
+            try:
+                conn = get_db()
+                conn.autocommit = True
+                cur = conn.cursor()
+                cur.execute(f"LISTEN {CHANNEL}")
+                cur.execute("SELECT last_value FROM issue_version_seq")
+                self._reset(cur.fetchone()[0])
+
+                while True:
+                    if select.select([conn], [], [], 30) == ([], [], []):
+                        # Idle: make sure the connection is still alive
+                        cur.execute("SELECT 1")
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._apply(conn.notifies.pop(0).payload)
+            except Exception:
+                # Notifications may have been missed: stop answering 304
+                # until we are listening again with a fresh floor.
+                with self._lock:
+                    self._floor = None
+                time.sleep(VERSIONS_RETRY_SECONDS)
+            finally:
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+
+    def _reset(self, floor):
+        with self._lock:
+            self._versions.clear()
+            self._floor = floor
+            self._latest = floor
+            self._out_of_order = 0
+            self._changed_at = time.time()
+
+    def _apply(self, payload):
+        target, _, seq = payload.partition(":")
+        with self._lock:
+            self._bump(target, int(seq))
+
+    def apply_local(self, payloads):
+        # This worker's own committed changes, ahead of their NOTIFY (which
+        # then arrives as a no-op). Without a live listener there is no
+        # floor to build on, and no 304s to get wrong.
+        with self._lock:
+            if self._floor is None or self._pid != os.getpid():
+                return
+            for payload in payloads:
+                target, _, seq = payload.partition(":")
+                self._bump(target, int(seq))
+
+    def _bump(self, target, seq):
+        # Called with self._lock held
+        if target == "*":
+            # Keep versions newer than the bulk change: a "*" can
+            # arrive after them
+            self._floor = max(self._floor or 0, seq)
+            self._versions = OrderedDict(
+                (i, v) for i, v in self._versions.items() if v > self._floor
+            )
+        else:
+            issue_id = int(target)
+            self._versions[issue_id] = max(self._versions.get(issue_id, 0), seq)
+            self._versions.move_to_end(issue_id)
+            if len(self._versions) > self.max_entries:
+                # Forgetting a version must not make it look older
+                _, evicted = self._versions.popitem(last=False)
+                self._floor = max(self._floor, evicted)
+
+        # Commits can arrive out of seq order across issues; the
+        # collection version then becomes worker-local until the next
+        # in-order change.
+        if seq > self._latest:
+            self._latest = seq
+            self._out_of_order = 0
+        elif seq < self._latest:
+            self._out_of_order += 1
+        self._changed_at = time.time()
+
+    # ---------------- VERSIONS ----------------
+
+    def issue_version(self, issue_id):
+        self.ensure_started()
+        with self._lock:
+            if self._floor is None:
+                return None
+            return f"v{max(self._versions.get(issue_id, 0), self._floor)}"
+
+    def collection_version(self):
+        self.ensure_started()
+        with self._lock:
+            if self._floor is None:
+                return None
+            if self._out_of_order:
+                return f"v{self._latest}-{os.getpid()}-{self._out_of_order}"
+            return f"v{self._latest}"
+
+    def last_modified(self):
+        return formatdate(self._changed_at, usegmt=True)
+
+
+versions = IssueVersions()
+
+
+# -----------------------------
+# CONDITIONAL GET HELPERS
+# -----------------------------
+
+def make_etag(version, *scope):
+    # scope: anything else the body depends on (viewer, query string)
+    if version is None:
+        return None
+    if not scope:
+        return version
+    key = "|".join(str(s) for s in scope)
+    digest = hashlib.sha1(f"{current_app.secret_key}|{key}".encode()).hexdigest()[:12]
+    return f"{version}.{digest}"
+
+
+def not_modified(etag, private=False):
+    # 304 response when the client already holds this version, else None
+    if etag is None or not request.if_none_match.contains_weak(etag):
+        return None
+    response = current_app.response_class(status=304)
+    return with_etag(response, etag, private)
+
+
+def with_etag(response, etag, private=False):
+    if etag is not None and response.status_code == 200:
+        response.set_etag(etag, weak=True)
+        response.headers["Last-Modified"] = versions.last_modified()
+    # Always revalidate; private for per-user views
+    response.headers["Cache-Control"] = "private, no-cache" if private else "no-cache"
+    return response
@@ -0,0 +1,118 @@
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+)
+from prometheus_client import multiprocess
+
+# -----------------------------
+# METRICS
+# -----------------------------
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to an empty directory
+# (wiped at deploy) before the workers start: every worker then writes its
+# samples there and /metrics sums them, whichever worker serves the scrape.
+
+MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+BYTES_BUCKETS = tuple(1024 * 4 ** i for i in range(9))          # 1 KB .. 64 MB
+ROWS_BUCKETS = (0, 1, 5, 10, 50, 100, 500, 1000, 5000, 10000, 50000)
+
+REQUEST_SECONDS = Histogram(
+    "civic_http_request_duration_seconds",
+    "Request latency by blueprint and route",
+    ["blueprint", "endpoint", "method", "status"]
+)
+UPLOAD_BYTES = Histogram(
+    "civic_http_upload_bytes",
+    "Request body size of uploads",
+    ["endpoint"],
+    buckets=BYTES_BUCKETS
+)
+DB_POOL_WAIT_SECONDS = Histogram(
+    "civic_db_pool_wait_seconds",
+    "Time to borrow a pooled connection (including any new connect)"
+)
+DB_CONNECT_SECONDS = Histogram(
+    "civic_db_connect_seconds",
+    "Time to open a new database connection"
+)
+DB_QUERY_SECONDS = Histogram(
+    "civic_db_query_seconds",
+    "Statement execution time by calling route",
+    ["endpoint"]
+)
+DB_ROWS = Histogram(
+    "civic_db_rows_returned",
+    "Rows returned (or affected) per statement by calling route",
+    ["endpoint"],
+    buckets=ROWS_BUCKETS
+)
+PREDICT_STAGE_SECONDS = Histogram(
+    "civic_predict_stage_seconds",
+    "Classifier time per stage: decode, preprocess, inference",
+    ["stage"]
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    "civic_password_hash_seconds",
+    "Password hash / verify latency including queueing for the pool",
+    ["op"],
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "civic_password_hash_rejected",
+    "Hash requests refused because the pool was saturated or too slow",
+    ["op"]
+)
+
+
+def current_endpoint():
+    # Label for work done outside a request (job workers, scripts)
+    try:
+        return request.endpoint or "unknown"
+    except RuntimeError:
+        return "background"
+
+
+def observe_query(started, rowcount):
+    endpoint = current_endpoint()
+    DB_QUERY_SECONDS.labels(endpoint).observe(time.perf_counter() - started)
+    if rowcount is not None and rowcount >= 0:
+        DB_ROWS.labels(endpoint).observe(rowcount)
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop("metrics_started", None)
+    if started is None or request.endpoint == "metrics":
+        return response
+
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_SECONDS.labels(
+        request.blueprint or "app", endpoint, request.method, response.status_code
+    ).observe(time.perf_counter() - started)
+
+    if request.method in ("POST", "PUT") and request.content_length:
+        UPLOAD_BYTES.labels(endpoint).observe(request.content_length)
+
+    return response
+
+
+def metrics_view():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        body = generate_latest(registry)
+    else:
+        body = generate_latest()
+    return Response(body, content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
@@ -1,37 +1,252 @@
-import tensorflow as tf
+import os
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
 from flask import request, jsonify, Blueprint
-from PIL import Image, ImageFile
+from PIL import ImageFile
 import numpy as np
+
+from auth_utils import admin_required
+from services.batcher import MicroBatcher, BatcherFull
+from services.inference import INFERENCE_FALLBACK, InferenceUnavailable, inference
+from services.metrics import PREDICT_STAGE_SECONDS
+from services.model_manager import ModelManager, ModelNotReady, model_loader
+from services.prediction_cache import PredictionCache, content_hash, perceptual_hash
+from services.preprocess import InputBuffers, open_for_model, resize_for_model, to_input
+
 ml_bp = Blueprint("ml", __name__)
-model = tf.keras.models.load_model("civic_issue_model.keras")
 
+ImageFile.LOAD_TRUNCATED_IMAGES = True
+
+# -----------------------------
+# MODEL CONFIG
+# -----------------------------
+MODEL_PATH = os.getenv("MODEL_PATH", "civic_issue_model.keras")
+# keras | tflite | auto (by file extension). Export TFLite models with
+# python -m services.model_export
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "auto")
+# Load in a background thread at worker start instead of on first /predict.
+# Don't combine with gunicorn --preload: TensorFlow is not fork-safe.
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "0") == "1"
+
+# -----------------------------
+# BATCHING CONFIG
+# -----------------------------
+PREDICT_BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "5"))
+PREDICT_MAX_BATCH = int(os.getenv("PREDICT_MAX_BATCH", "16"))
+PREDICT_MAX_QUEUE = int(os.getenv("PREDICT_MAX_QUEUE", "256"))
+PREDICT_TIMEOUT = float(os.getenv("PREDICT_TIMEOUT", "30"))
+
+# -----------------------------
+# CACHE CONFIG
+# -----------------------------
+PREDICT_CACHE_SIZE = int(os.getenv("PREDICT_CACHE_SIZE", "1024"))
+PREDICT_CACHE_TTL = float(os.getenv("PREDICT_CACHE_TTL", "3600"))
+PREDICT_CACHE_PHASH = os.getenv("PREDICT_CACHE_PHASH", "1") == "1"
+# Max differing bits (of 64) for two images to count as the same photo
+PREDICT_CACHE_PHASH_DISTANCE = int(os.getenv("PREDICT_CACHE_PHASH_DISTANCE", "4"))
+
+
+models = ModelManager(
+    MODEL_PATH,
+    loader=model_loader(MODEL_BACKEND),
+    warmup_batches=(1, PREDICT_MAX_BATCH)
+)
+
+if MODEL_PRELOAD:
+    models.load_async()
+
+
+def _run_batch(batch):
+    # Each row carries the snapshot (labels, version) of the model that produced it
+    loaded = models.get()
+    preds = loaded.model.predict_on_batch(batch)
+    return [(row, loaded) for row in preds]
+
+
+batcher = MicroBatcher(
+    _run_batch,
+    max_batch=PREDICT_MAX_BATCH,
+    window_ms=PREDICT_BATCH_WINDOW_MS,
+    max_queue=PREDICT_MAX_QUEUE
+)
+
+input_buffers = InputBuffers()
+
+# Keyed by model version so a reload never serves stale predictions
+prediction_cache = PredictionCache(
+    max_entries=PREDICT_CACHE_SIZE,
+    ttl=PREDICT_CACHE_TTL,
+    phash_distance=PREDICT_CACHE_PHASH_DISTANCE
+)
+
+
+def infer_local(img):
+    # In-process inference: the fallback for web workers, and what the
+    # inference service itself runs. img is a PIL image or uint8 array,
+    # already at the model input size.
+    arr = to_input(img, input_buffers.get())
+    try:
+        preds, loaded = batcher(arr, timeout=PREDICT_TIMEOUT)   # e.g. [0.12, 0.81, 0.07]
+    except FutureTimeout:
+        input_buffers.discard()
+        raise
+
+    class_idx = np.argmax(preds)         # index of highest confidence
+    return loaded.classes[class_idx], float(preds[class_idx]), loaded.version
+
+
+def _remote(call, *args):
+    # Runs call on the inference service; None means "use the local model"
+    if inference is None:
+        return None
+    try:
+        return call(*args)
+    except InferenceUnavailable:
+        if INFERENCE_FALLBACK != "local":
+            raise
+        return None
+
+
+def model_version():
+    version = _remote(inference.version) if inference else None
+    return version or models.get_ready().version
+
+
+def classify(data, img=None):
+    # Shared by /predict and the combined submission endpoint. Pass the
+    # already-decoded PIL image when there is one so the upload is not
+    # parsed twice. Raises ModelNotReady, BatcherFull, FutureTimeout, or
+    # OSError when the upload doesn't decode.
+    return _classify(data, img, want_phash=False)[0]
+
+
+def classify_with_phash(data, img=None):
+    # -> (result, perceptual hash). The hash comes from the same reduced
+    # decode as the prediction (or the cache entry), so submissions don't
+    # decode the upload again for duplicate matching.
+    return _classify(data, img, want_phash=True)
+
+
+def _classify(data, img, want_phash):
+    version = model_version()
+
+    # Exact resubmission: no decode, no inference
+    sha = content_hash(data)
+    if PREDICT_CACHE_SIZE:
+        hit = prediction_cache.get_with_phash(version, sha)
+        if hit is not None:
+            result, phash = hit
+            if phash is None and want_phash:
+                # Cached while the phash cache was off
+                phash = perceptual_hash(img if img is not None else open_for_model(data))
+            return result, phash
+
+    started = time.perf_counter()
+    if img is None:
+        img = open_for_model(data)
+    img.load()
+    PREDICT_STAGE_SECONDS.labels("decode").observe(time.perf_counter() - started)
+
+    phash = None
+    if want_phash or (PREDICT_CACHE_SIZE and PREDICT_CACHE_PHASH):
+        phash = perceptual_hash(img)
+
+    # Re-encoded copy of a recent photo: decoded, but no inference
+    if PREDICT_CACHE_SIZE and PREDICT_CACHE_PHASH:
+        cached = prediction_cache.get_similar(version, phash)
+        if cached is not None:
+            prediction_cache.put(version, sha, cached, phash)
+            return cached, phash
+    elif PREDICT_CACHE_SIZE:
+        prediction_cache.miss()
+
+    started = time.perf_counter()
+    img = resize_for_model(img)
+    PREDICT_STAGE_SECONDS.labels("preprocess").observe(time.perf_counter() - started)
+
+    # 🔥 MODEL PREDICTION (MULTI-CLASS), batched with concurrent requests
+    # (across all workers when the inference service is in use)
+    started = time.perf_counter()
+    predicted = _remote(inference.predict, img) if inference else None
+    issue, confidence, version = predicted or infer_local(img)
+    PREDICT_STAGE_SECONDS.labels("inference").observe(time.perf_counter() - started)
+
+    result = {
+        "prediction": issue,
+        "confidence": confidence,
+        "severity_score": round(confidence * 10, 2)
+    }
+
+    if PREDICT_CACHE_SIZE:
+        prediction_cache.put(version, sha, result, phash)
+
+    return result, phash
 
-CLASSES = ["pothole", "garbage", "water"]
 
 @ml_bp.route("/predict", methods=["POST"])
 def predict():
-        
-    ImageFile.LOAD_TRUNCATED_IMAGES = True
-
     file = request.files.get("image")
 
     if not file or file.filename == "":
         return jsonify({"error": "No image file received"}), 400
 
-    img = Image.open(file).convert("RGB").resize((224, 224))
+    try:
+        result = classify(file.read())
+    except ModelNotReady:
+        return jsonify({"error": "Model is still loading, please retry"}), 503
+    except BatcherFull:
+        return jsonify({"error": "Prediction service busy, please retry"}), 503
+    except FutureTimeout:
+        return jsonify({"error": "Prediction timed out"}), 504
+    except OSError:
+        # Not an image, or the pixel data doesn't decode
+        return jsonify({"error": "Could not read image"}), 400
 
-    arr = np.expand_dims(np.array(img) / 255.0, axis=0)
+    return jsonify(result)
 
-    # 🔥 MODEL PREDICTION (MULTI-CLASS)
-    preds = model.predict(arr)[0]        # e.g. [0.12, 0.81, 0.07]
-    class_idx = np.argmax(preds)         # index of highest confidence
-    confidence = preds[class_idx]
 
-    classes = ["pothole", "garbage", "water"]
-    issue = classes[class_idx]
+@ml_bp.route("/predict/stats", methods=["GET"])
+@admin_required
+def predict_stats():
+    try:
+        batcher_stats = _remote(inference.stats) if inference else None
+    except InferenceUnavailable as e:
+        batcher_stats = {"error": str(e)}
 
     return jsonify({
-        "prediction": issue,
-        "confidence": float(confidence),
-        "severity_score": round(float(confidence * 10), 2)
+        "batcher": batcher_stats or batcher.stats(),
+        "cache": prediction_cache.stats()
     })
+
+
+@ml_bp.route("/predict/ready", methods=["GET"])
+def predict_ready():
+    try:
+        status = _remote(inference.status) if inference else None
+    except InferenceUnavailable as e:
+        status = {"state": "unreachable", "ready": False, "error": str(e)}
+
+    status = status or models.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+
+@ml_bp.route("/predict/reload", methods=["POST"])
+@admin_required
+def predict_reload():
+    path = request.form.get("path") or None
+
+    # With the inference service, that process reloads; workers never
+    # load the model themselves
+    try:
+        if inference is not None:
+            return jsonify(inference.reload(path))
+        models.reload(path)
+    except FileNotFoundError:
+        return jsonify({"error": "Model file not found"}), 404
+    except InferenceUnavailable as e:
+        return jsonify({"error": str(e)}), 503
+    except Exception as e:
+        return jsonify({"error": f"Reload failed: {e}"}), 500
+
+    return jsonify(models.status())
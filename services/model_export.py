@@ -0,0 +1,137 @@
+import argparse
+import json
+import os
+import random
+import sys
+
+import numpy as np
+
+from services.model_manager import read_metadata
+from services.preprocess import preprocess
+
+# -----------------------------
+# TFLITE EXPORT
+# -----------------------------
+# Keras model -> float16 or int8 TFLite (calibrated through the /predict
+# preprocessing), each with a metadata sidecar.
+#   python -m services.model_export --calibration-dir dataset_classification
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+QUANTIZATIONS = ("float16", "int8")
+CALIBRATION_SAMPLES = 200
+
+
+# -----------------------------
+# SAMPLE IMAGES
+# -----------------------------
+# Same layout as training: <root>/<class name>/<image>. Labels are looked
+# up in the model's own class list, not in directory order.
+
+def labelled_images(root, classes, limit=None, seed=0):
+    samples = []
+    for name in sorted(os.listdir(root)):
+        folder = os.path.join(root, name)
+        if not os.path.isdir(folder):
+            continue
+        if name not in classes:
+            raise ValueError(f"{folder}: not one of the model classes {classes}")
+        label = classes.index(name)
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                samples.append((os.path.join(folder, filename), label))
+
+    if limit and len(samples) > limit:
+        samples = random.Random(seed).sample(samples, limit)
+    return samples
+
+
+def load_input(path):
+    # The same decode and preprocessing as /predict
+    with open(path, "rb") as f:
+        return preprocess(f.read())
+
+
+# -----------------------------
+# EXPORT
+# -----------------------------
+
+def convert(model, quantization, calibration=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        if not calibration:
+            raise ValueError("int8 export needs calibration images")
+
+        def representative_dataset():
+            for path, _ in calibration:
+                yield [load_input(path)[np.newaxis]]
+
+        converter.representative_dataset = representative_dataset
+        # Every op in int8; input and output stay float32 so the serving
+        # code is the same for every backend
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(f"Unknown quantization: {quantization}")
+
+    return converter.convert()
+
+
+def export(model_path, quantizations=QUANTIZATIONS, calibration_dir=None,
+           samples=CALIBRATION_SAMPLES, out_dir=None, out=print):
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(model_path)
+    classes, version = read_metadata(model_path)
+
+    calibration = None
+    if "int8" in quantizations:
+        if not calibration_dir:
+            raise ValueError("int8 export needs --calibration-dir")
+        calibration = labelled_images(calibration_dir, classes, samples)
+        out(f"calibrating on {len(calibration)} images from {calibration_dir}")
+
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    out_dir = out_dir or os.path.dirname(model_path) or "."
+    os.makedirs(out_dir, exist_ok=True)
+
+    written = []
+    for quantization in quantizations:
+        path = os.path.join(out_dir, f"{stem}_{quantization}.tflite")
+        with open(path, "wb") as f:
+            f.write(convert(model, quantization, calibration))
+
+        with open(os.path.splitext(path)[0] + ".json", "w") as f:
+            json.dump({
+                "version": f"{version}-{quantization}",
+                "classes": classes,
+                "source": os.path.basename(model_path),
+                "quantization": quantization,
+            }, f, indent=2)
+
+        out(f"wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+        written.append(path)
+
+    return written
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Export quantized TFLite models")
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "civic_issue_model.keras"))
+    parser.add_argument("--quantize", nargs="+", choices=QUANTIZATIONS, default=list(QUANTIZATIONS))
+    parser.add_argument("--calibration-dir", help="<class>/<image> folders (int8 only)")
+    parser.add_argument("--samples", type=int, default=CALIBRATION_SAMPLES,
+                        help="calibration images, sampled across classes")
+    parser.add_argument("--out-dir", help="defaults to the model's folder")
+    args = parser.parse_args(argv)
+
+    export(args.model, args.quantize, args.calibration_dir, args.samples, args.out_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+DEFAULT_CLASSES = ["pothole", "garbage", "water"]
+
+# One immutable snapshot per loaded model file. Labels travel with the
+# model they were trained for, so a reload can never pair new weights
+# with an old CLASSES list.
+LoadedModel = namedtuple("LoadedModel", "model classes version path loaded_at")
+
+
+class ModelNotReady(Exception):
+    pass
+
+
+# Interpreter threads per TFLite model (0: let TFLite decide)
+TFLITE_THREADS = int(os.getenv("TFLITE_THREADS", "0"))
+
+
+def _keras_loader(path):
+    # Imported here so web workers don't pay the TensorFlow import until
+    # the model is actually needed.
+    import tensorflow as tf
+    return tf.keras.models.load_model(path)
+
+
+def _tflite_interpreter():
+    # The standalone tflite-runtime wheel is a few MB; full TensorFlow
+    # also works when that is what is installed.
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        import tensorflow as tf
+        Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteModel:
+    # Just enough of the Keras model interface (input_shape, output_shape,
+    # predict_on_batch) for the manager, warmup and the batcher.
+    def __init__(self, path, num_threads=None):
+        Interpreter = _tflite_interpreter()
+        self._interpreter = Interpreter(model_path=path, num_threads=num_threads or None)
+        self._interpreter.allocate_tensors()
+        self._lock = threading.Lock()
+
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch = int(self._input["shape"][0])
+
+        self.input_shape = (None,) + tuple(int(d) for d in self._input["shape"][1:])
+        self.output_shape = (None,) + tuple(int(d) for d in self._output["shape"][1:])
+
+    def _resize(self, batch_size):
+        shape = [batch_size] + list(self._input["shape"][1:])
+        self._interpreter.resize_tensor_input(self._input["index"], shape)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch = batch_size
+
+    def predict_on_batch(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+
+        # One interpreter per model: calls are serialized (the batcher
+        # already runs them from a single thread)
+        with self._lock:
+            if batch.shape[0] != self._batch:
+                self._resize(batch.shape[0])
+
+            self._interpreter.set_tensor(self._input["index"], _quantize(batch, self._input))
+            self._interpreter.invoke()
+            out = self._interpreter.get_tensor(self._output["index"])
+
+        return _dequantize(out, self._output)
+
+
+def _quantize(batch, detail):
+    # Full-integer models may take int8/uint8 input instead of float32
+    dtype = detail["dtype"]
+    if dtype == np.float32:
+        return batch
+    scale, zero_point = detail["quantization"]
+    info = np.iinfo(dtype)
+    return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def _dequantize(out, detail):
+    if out.dtype == np.float32:
+        return out.copy()
+    scale, zero_point = detail["quantization"]
+    return (out.astype(np.float32) - zero_point) * scale
+
+
+def _tflite_loader(path):
+    return TFLiteModel(path, TFLITE_THREADS)
+
+
+LOADERS = {
+    "keras": _keras_loader,
+    "tflite": _tflite_loader,
+}
+
+
+def backend_for(path, backend="auto"):
+    if backend != "auto":
+        return backend
+    return "tflite" if path.endswith(".tflite") else "keras"
+
+
+def model_loader(backend="auto"):
+    # "auto" picks per file, so /predict/reload can switch between a
+    # .keras and a .tflite model without a restart
+    if backend != "auto" and backend not in LOADERS:
+        raise ValueError(f"Unknown model backend: {backend}")
+    return lambda path: LOADERS[backend_for(path, backend)](path)
+
+
+def read_metadata(path):
+    # Sidecar next to the model: civic_issue_model.keras -> civic_issue_model.json
+    meta_path = os.path.splitext(path)[0] + ".json"
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    classes = list(meta.get("classes") or DEFAULT_CLASSES)
+    version = str(meta.get("version") or int(os.path.getmtime(path)))
+    return classes, version
+
+
+# -----------------------------
+# MODEL MANAGER
+# -----------------------------
+
+class ModelManager:
+    def __init__(self, path, loader=_keras_loader, warmup_batches=(1,)):
+        self.path = path
+        self.loader = loader
+        self.warmup_batches = warmup_batches
+
+        self._current = None
+        self._state = "unloaded"
+        self._error = None
+        self._load_seconds = 0.0
+        self._load_lock = threading.Lock()
+        self._loading_thread = None
+
+    # ---------------- LOADING ----------------
+
+    def _load(self, path):
+        started = time.monotonic()
+        model = self.loader(path)
+        classes, version = read_metadata(path)
+
+        outputs = model.output_shape[-1]
+        if outputs != len(classes):
+            raise ValueError(
+                f"{path} has {outputs} outputs but {len(classes)} classes"
+            )
+
+        self._warmup(model)
+
+        loaded = LoadedModel(model, classes, version, path, time.time())
+        return loaded, time.monotonic() - started
+
+    def _input_shape(self, model):
+        shape = getattr(model, "input_shape", None)
+        if shape and all(dim is not None for dim in shape[1:]):
+            return tuple(shape[1:])
+        return (224, 224, 3)
+
+    def _warmup(self, model):
+        # Trace the graph for the batch sizes we serve before taking traffic
+        shape = self._input_shape(model)
+        for size in self.warmup_batches:
+            model.predict_on_batch(np.zeros((size,) + shape, dtype=np.float32))
+
+    def _swap_in(self, path):
+        self._state = "loading" if self._current is None else "reloading"
+        try:
+            loaded, took = self._load(path)
+        except Exception as e:
+            self._error = f"{type(e).__name__}: {e}"
+            self._state = "failed" if self._current is None else "ready"
+            raise
+
+        # Single reference assignment: in-flight requests keep the
+        # snapshot they already hold, new requests see the new one.
+        self._current = loaded
+        self.path = path
+        self._error = None
+        self._state = "ready"
+        self._load_seconds = took
+        return loaded
+
+    def get(self):
+        current = self._current
+        if current is not None:
+            return current
+
+        with self._load_lock:
+            if self._current is None:
+                self._swap_in(self.path)
+            return self._current
+
+    def load_async(self):
+        with self._load_lock:
+            if self._current is not None or self._loading_thread is not None:
+                return
+
+            def run():
+                try:
+                    self.get()
+                except Exception:
+                    pass
+                finally:
+                    self._loading_thread = None
+
+            self._loading_thread = threading.Thread(
+                target=run, name="model-loader", daemon=True
+            )
+            self._loading_thread.start()
+
+    def reload(self, path=None):
+        path = path or self.path
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+
+        with self._load_lock:
+            return self._swap_in(path)
+
+    def get_ready(self):
+        # Non-blocking accessor for request threads while a background load runs
+        current = self._current
+        if current is None:
+            if self._loading_thread is not None:
+                raise ModelNotReady(self._state)
+            return self.get()
+        return current
+
+    # ---------------- STATUS ----------------
+
+    def status(self):
+        current = self._current
+        info = {
+            "state": self._state,
+            "ready": current is not None,
+            "error": self._error,
+        }
+        if current is not None:
+            info.update({
+                "path": current.path,
+                "backend": "tflite" if isinstance(current.model, TFLiteModel) else "keras",
+                "version": current.version,
+                "classes": current.classes,
+                "loaded_at": current.loaded_at,
+                "load_seconds": round(self._load_seconds, 3),
+            })
+        return info
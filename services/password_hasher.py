@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+from services.metrics import PASSWORD_HASH_REJECTED, PASSWORD_HASH_SECONDS
+
+# -----------------------------
+# HASHING CONFIG
+# -----------------------------
+# Any werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# Changing it upgrades each stored hash the next time its owner logs in.
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hashes queued or running per web worker before new ones are refused
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+
+class HasherBusy(Exception):
+    pass
+
+
+# -----------------------------
+# RUNS IN THE POOL PROCESSES
+# -----------------------------
+
+_prefixes = {}
+
+
+def _method_prefix(method):
+    # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"); hash once
+    # to learn the exact prefix new hashes get under this method.
+    if method not in _prefixes:
+        _prefixes[method] = generate_password_hash("", method).split("$", 1)[0]
+    return _prefixes[method]
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method)
+
+
+def _verify(stored, password, method):
+    if not check_password_hash(stored, password):
+        return False, None
+    if stored.split("$", 1)[0] == _method_prefix(method):
+        return True, None
+    return True, generate_password_hash(password, method)
+
+
+# -----------------------------
+# PER-WORKER PROCESS POOL
+# -----------------------------
+# Hashing is CPU-bound and holds the GIL, so it runs in child processes;
+# request threads only wait on a future. Spawned (not forked) children:
+# the parent is a threaded gunicorn worker.
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+
+    pid = os.getpid()
+    if _executor is not None and _executor_pid == pid:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != pid:
+            _executor = ProcessPoolExecutor(
+                max_workers=PASSWORD_HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            _executor_pid = pid
+    return _executor
+
+
+def _run(op, fn, *args):
+    if not _slots.acquire(blocking=False):
+        PASSWORD_HASH_REJECTED.labels(op).inc()
+        raise HasherBusy(f"{PASSWORD_HASH_MAX_PENDING} password hashes already pending")
+
+    started = time.perf_counter()
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeout:
+        PASSWORD_HASH_REJECTED.labels(op).inc()
+        raise HasherBusy(f"password hash took longer than {PASSWORD_HASH_TIMEOUT}s")
+    finally:
+        PASSWORD_HASH_SECONDS.labels(op).observe(time.perf_counter() - started)
+
+
+def hash_password(password):
+    return _run("hash", _hash, password, PASSWORD_HASH_METHOD)
+
+
+def verify_password(stored, password):
+    # Returns (ok, new_hash); new_hash is set when the stored hash used an
+    # older method and should be written back.
+    return _run("verify", _verify, stored, password, PASSWORD_HASH_METHOD)
@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+_MASK = (1 << 64) - 1
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(img):
+    # 64-bit difference hash: survives re-encoding and mild resizing
+    small = img.convert("L").resize((9, 8))
+    pixels = list(small.getdata())
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def phash_distance(a, b):
+    # Differing bits of two 64-bit hashes. Masked, so hashes read back
+    # from a signed BIGINT compare like the unsigned originals; no
+    # int.bit_count (Python 3.10+).
+    return bin((a ^ b) & _MASK).count("1")
+
+
+# -----------------------------
+# LRU + TTL PREDICTION CACHE
+# -----------------------------
+
+class PredictionCache:
+    def __init__(self, max_entries=1024, ttl=3600, phash_distance=4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.phash_distance = phash_distance
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (version, sha) -> (result, phash, expires)
+        self._phashes = {}              # (version, phash) -> (version, sha)
+
+        self.hits = 0
+        self.phash_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _drop(self, key):
+        _, phash, _ = self._entries.pop(key)
+        if phash is not None and self._phashes.get((key[0], phash)) == key:
+            del self._phashes[(key[0], phash)]
+
+    def _fresh(self, key, now):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[2] <= now:
+            self._drop(key)
+            self.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, version, sha):
+        hit = self.get_with_phash(version, sha)
+        return hit[0] if hit else None
+
+    def get_with_phash(self, version, sha):
+        # -> (result, phash) on an exact hit, else None
+        with self._lock:
+            entry = self._fresh((version, sha), time.monotonic())
+            if entry is None:
+                return None
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def get_similar(self, version, phash):
+        # Called after a content-hash miss, once the image is decoded
+        now = time.monotonic()
+        with self._lock:
+            key = self._phashes.get((version, phash))
+
+            if key is None and self.phash_distance:
+                for (v, other), candidate in self._phashes.items():
+                    if v == version and phash_distance(phash, other) <= self.phash_distance:
+                        key = candidate
+                        break
+
+            entry = self._fresh(key, now) if key is not None else None
+            if entry is not None:
+                self.phash_hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def put(self, version, sha, result, phash=None):
+        key = (version, sha)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+
+            self._entries[key] = (result, phash, time.monotonic() + self.ttl)
+            if phash is not None:
+                self._phashes[(version, phash)] = key
+
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.phash_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "phash_hits": self.phash_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round((self.hits + self.phash_hits) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,80 @@
+import io
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+# -----------------------------
+# PREPROCESS CONFIG
+# -----------------------------
+INPUT_SIZE = int(os.getenv("MODEL_INPUT_SIZE", "224"))
+# Let libjpeg scale by 1/2, 1/4 or 1/8 while decoding (never below INPUT_SIZE)
+PREPROCESS_DRAFT = os.getenv("PREPROCESS_DRAFT", "1") == "1"
+# Resize shrinks by whole factors first when the source is this many
+# times larger than the target (PIL reducing_gap)
+PREPROCESS_REDUCING_GAP = float(os.getenv("PREPROCESS_REDUCING_GAP", "2.0"))
+
+_SCALE = np.float32(1.0 / 255.0)
+
+
+# -----------------------------
+# DECODE
+# -----------------------------
+# A 12 MP phone JPEG decoded at full size costs more than inference. With
+# draft mode libjpeg skips most of the IDCT work and hands back the
+# smallest 1/2^n scale still at least INPUT_SIZE on both sides, already in
+# RGB. Other formats decode normally.
+
+def open_for_model(data, size=INPUT_SIZE):
+    img = Image.open(io.BytesIO(data))
+    if PREPROCESS_DRAFT and img.format == "JPEG":
+        img.draft("RGB", (size, size))
+    return img
+
+
+def resize_for_model(img, size=INPUT_SIZE):
+    # Works on drafted and fully decoded images alike
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    if img.size == (size, size):
+        return img
+    return img.resize((size, size), Image.BICUBIC, reducing_gap=PREPROCESS_REDUCING_GAP)
+
+
+# -----------------------------
+# INPUT ARRAYS
+# -----------------------------
+
+def to_input(img, out=None):
+    # uint8 HxWx3 -> float32 in [0, 1], written straight into out (no
+    # float64 temporary, no second cast in the model)
+    pixels = np.asarray(img, dtype=np.uint8)
+    if out is None:
+        out = np.empty(pixels.shape, dtype=np.float32)
+    np.multiply(pixels, _SCALE, out=out)
+    return out
+
+
+class InputBuffers:
+    # One preallocated input array per request thread. The batcher copies
+    # each row into its batch before running it, so a buffer is free again
+    # once the caller has its prediction back. A caller that gives up
+    # early (timeout) must discard() it: the row may still be queued.
+    def __init__(self, shape=(INPUT_SIZE, INPUT_SIZE, 3)):
+        self.shape = shape
+        self._local = threading.local()
+
+    def get(self):
+        buf = getattr(self._local, "buf", None)
+        if buf is None:
+            buf = self._local.buf = np.empty(self.shape, dtype=np.float32)
+        return buf
+
+    def discard(self):
+        self._local.buf = None
+
+
+def preprocess(data, out=None, size=INPUT_SIZE):
+    img = open_for_model(data, size)
+    return to_input(resize_for_model(img, size), out)
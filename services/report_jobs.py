@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+import uuid
+
+import psycopg2
+from psycopg2.extras import Json, RealDictCursor
+
+from routes.db import db_cursor
+
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))
+REPORT_POLL_SECONDS = float(os.getenv("REPORT_POLL_SECONDS", "1"))
+REPORT_MAX_ATTEMPTS = int(os.getenv("REPORT_MAX_ATTEMPTS", "3"))
+# A job still "processing" after this long belongs to a dead worker
+REPORT_STALE_SECONDS = int(os.getenv("REPORT_STALE_SECONDS", "300"))
+# How often idle workers fail dead jobs that are out of attempts
+REPORT_SWEEP_SECONDS = float(os.getenv("REPORT_SWEEP_SECONDS", "60"))
+
+
+class JobLost(Exception):
+    # The job was re-claimed (or finished) by another worker while this
+    # attempt was still running
+    pass
+
+
+# -----------------------------
+# UPLOADS (report_job_uploads table)
+# -----------------------------
+# In Postgres with the job, not on the enqueueing node's disk: whichever
+# node claims the job can read them. Written with the job row, deleted
+# in the transaction that completes or finally fails it.
+
+def load_uploads(job_id):
+    # -> {field: (ext, bytes)}
+    with db_cursor() as cur:
+        cur.execute("""
+            SELECT field, ext, data
+            FROM report_job_uploads
+            WHERE job_id = %s
+        """, (job_id,))
+        return {field: (ext, bytes(data)) for field, ext, data in cur.fetchall()}
+
+
+def _drop_uploads(cur, job_ids):
+    cur.execute("""
+        DELETE FROM report_job_uploads WHERE job_id = ANY(%s)
+    """, (list(job_ids),))
+
+
+# -----------------------------
+# QUEUE (report_jobs table)
+# -----------------------------
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+
+def enqueue(job_id, payload, citizen_email, uploads=None):
+    # uploads: {field: (ext, bytes)}, committed together with the job
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            INSERT INTO report_jobs (job_id, payload, citizen_email)
+            VALUES (%s, %s, %s)
+        """, (job_id, Json(payload), citizen_email))
+        for field, (ext, data) in (uploads or {}).items():
+            cur.execute("""
+                INSERT INTO report_job_uploads (job_id, field, ext, data)
+                VALUES (%s, %s, %s, %s)
+            """, (job_id, field, ext, psycopg2.Binary(data)))
+
+
+def claim_job():
+    with db_cursor(RealDictCursor, commit=True) as cur:
+        cur.execute("""
+            UPDATE report_jobs
+            SET status = 'processing',
+                attempts = attempts + 1,
+                locked_at = NOW(),
+                updated_at = NOW()
+            WHERE job_id = (
+                SELECT job_id
+                FROM report_jobs
+                WHERE (status = 'queued'
+                       OR (status = 'processing'
+                           AND locked_at < NOW() - make_interval(secs => %s)))
+                  AND attempts < %s
+                ORDER BY created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING job_id, payload, attempts
+        """, (REPORT_STALE_SECONDS, REPORT_MAX_ATTEMPTS))
+        return cur.fetchone()
+
+
+def set_stage(job_id, stage):
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE report_jobs
+            SET stage = %s, updated_at = NOW()
+            WHERE job_id = %s
+        """, (stage, job_id))
+
+
+def complete_job(cur, job_id, attempt, result):
+    # Takes the caller's cursor so the job is marked done in the same
+    # transaction as the issue insert, and only by the attempt that still
+    # owns it: a retry can never insert twice. Raises JobLost otherwise,
+    # which rolls the caller's transaction back.
+    cur.execute("""
+        UPDATE report_jobs
+        SET status = 'done', stage = 'done', result = %s,
+            error = NULL, locked_at = NULL, updated_at = NOW()
+        WHERE job_id = %s AND status = 'processing' AND attempts = %s
+    """, (Json(result), job_id, attempt))
+    if cur.rowcount != 1:
+        raise JobLost(job_id)
+    _drop_uploads(cur, [job_id])
+
+
+def fail_job(job_id, attempt, error, final):
+    # Non-final failures go back to the queue for another attempt. False
+    # when the attempt no longer owns the job (nothing is changed).
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE report_jobs
+            SET status = %s, error = %s, locked_at = NULL, updated_at = NOW()
+            WHERE job_id = %s AND status = 'processing' AND attempts = %s
+        """, ("failed" if final else "queued", error, job_id, attempt))
+        owned = cur.rowcount == 1
+        if owned and final:
+            _drop_uploads(cur, [job_id])
+        return owned
+
+
+def sweep_dead_jobs():
+    # claim_job skips jobs out of attempts, so one whose worker died on
+    # its last attempt would stay "processing" forever
+    with db_cursor(commit=True) as cur:
+        cur.execute("""
+            UPDATE report_jobs
+            SET status = 'failed',
+                error = 'worker stopped during the last attempt',
+                locked_at = NULL,
+                updated_at = NOW()
+            WHERE status = 'processing'
+              AND attempts >= %s
+              AND locked_at < NOW() - make_interval(secs => %s)
+            RETURNING job_id
+        """, (REPORT_MAX_ATTEMPTS, REPORT_STALE_SECONDS))
+        failed = [row[0] for row in cur.fetchall()]
+        if failed:
+            _drop_uploads(cur, failed)
+        return len(failed)
+
+
+def get_job(job_id, citizen_email):
+    with db_cursor(RealDictCursor) as cur:
+        cur.execute("""
+            SELECT job_id, status, stage, result, error, attempts,
+                   created_at, updated_at
+            FROM report_jobs
+            WHERE job_id = %s AND citizen_email IS NOT DISTINCT FROM %s
+        """, (job_id, citizen_email))
+        return cur.fetchone()
+
+
+# -----------------------------
+# WORKER POOL
+# -----------------------------
+# handler(job_id, payload, attempt) does the work and must finish with
+# complete_job() on the cursor of its final write. Threads start lazily,
+# once per process, so gunicorn forks each get their own pool; the
+# SKIP LOCKED claim keeps them from colliding.
+
+class JobWorkers:
+    def __init__(self, handler, workers=REPORT_WORKERS):
+        self.handler = handler
+        self.workers = workers
+        self._swept_at = 0.0
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+
+    def ensure_started(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._wake = threading.Event()
+            for i in range(self.workers):
+                threading.Thread(
+                    target=self._loop, name=f"report-worker-{i}", daemon=True
+                ).start()
+            self._pid = pid
+
+    def notify(self):
+        self.ensure_started()
+        self._wake.set()
+
+    def run_once(self):
+        job = claim_job()
+        if job is None:
+            self.sweep()
+            return False
+
+        job_id, attempt = job["job_id"], job["attempts"]
+        try:
+            self.handler(job_id, job["payload"], attempt)
+        except JobLost:
+            # The attempt that re-claimed it owns the job now
+            pass
+        except Exception as e:
+            fail_job(
+                job_id, attempt, f"{type(e).__name__}: {e}",
+                final=attempt >= REPORT_MAX_ATTEMPTS
+            )
+        return True
+
+    def sweep(self):
+        now = time.monotonic()
+        if now - self._swept_at < REPORT_SWEEP_SECONDS:
+            return
+        self._swept_at = now
+        sweep_dead_jobs()
+
+    def _loop(self):
+        while True:
+            try:
+                if self.run_once():
+                    continue
+            except Exception:
+                # DB unavailable or similar: back off and retry
+                time.sleep(REPORT_POLL_SECONDS)
+            self._wake.wait(REPORT_POLL_SECONDS)
+            self._wake.clear()
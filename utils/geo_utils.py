@@ -1,4 +1,8 @@
 import math
+
+EARTH_RADIUS_M = 6371000
+
+
 def dms_to_decimal(dms, ref):
     degrees = dms[0][0] / dms[0][1]
     minutes = dms[1][0] / dms[1][1]
@@ -12,7 +16,7 @@ def dms_to_decimal(dms, ref):
 
 
 def get_distance_m(lat1, lng1, lat2, lng2):
-    R = 6371000
+    R = EARTH_RADIUS_M
 
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
@@ -24,4 +28,156 @@ def get_distance_m(lat1, lng1, lat2, lng2):
         + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
     )
 
-    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
\ No newline at end of file
+    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def bounding_box(lat, lng, radius_m):
+    # (min_lat, max_lat, min_lng, max_lng) enclosing a circle of radius_m
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    min_lat = max(lat - dlat, -90.0)
+    max_lat = min(lat + dlat, 90.0)
+
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, max_lat, -180.0, 180.0
+
+    dlng = math.degrees(radius_m / (EARTH_RADIUS_M * math.cos(math.radians(lat))))
+    min_lng = lng - dlng
+    max_lng = lng + dlng
+
+    # Crossing the antimeridian: fall back to the full longitude band
+    if min_lng < -180.0 or max_lng > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+
+    return min_lat, max_lat, min_lng, max_lng
+
+
+# -----------------------------
+# GRID CELLS
+# -----------------------------
+# Fixed 0.001° grid (~110 m of latitude). A cell id packs the row and
+# column into one BIGINT; migration 0006 computes the same value in SQL.
+# Ids of one row are consecutive, so any run of columns is one id range.
+GRID_CELL_DEG = 0.001
+
+
+def grid_cell_id(row, col, cell_deg=GRID_CELL_DEG):
+    half_rows = round(90 / cell_deg)
+    half_cols = round(180 / cell_deg)
+    return (row + half_rows) * (2 * half_cols + 1) + col + half_cols
+
+
+def grid_cell(lat, lng, cell_deg=GRID_CELL_DEG):
+    return grid_cell_id(math.floor(lat / cell_deg), math.floor(lng / cell_deg), cell_deg)
+
+
+def grid_spans(lat, lng, radius_m, cell_deg=GRID_CELL_DEG):
+    # (row, first_col, last_col) runs of cells that can touch the circle.
+    # Wraps at the antimeridian instead of widening to every longitude;
+    # a row the circle wraps all the way round (near a pole) is one
+    # full-width run.
+    half_cols = round(180 / cell_deg)
+    angle = radius_m / EARTH_RADIUS_M
+    dlat = math.degrees(angle)
+    min_lat = max(lat - dlat, -90.0)
+    max_lat = min(lat + dlat, 90.0)
+
+    # Half-width in longitude, taken at the circle's poleward edge
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if math.sin(angle) < cos_lat:
+        dlng = math.degrees(math.asin(math.sin(angle) / cos_lat))
+        first = math.floor((lng - dlng) / cell_deg)
+        last = math.floor((lng + dlng) / cell_deg)
+    else:
+        first, last = -half_cols, half_cols
+
+    if last - first >= 2 * half_cols:
+        cols = [(-half_cols, half_cols)]
+    elif first <= -half_cols:
+        cols = [(first + 2 * half_cols, half_cols), (-half_cols, last)]
+    elif last >= half_cols:
+        cols = [(first, half_cols), (-half_cols, last - 2 * half_cols)]
+    else:
+        cols = [(first, last)]
+
+    rows = range(math.floor(min_lat / cell_deg), math.floor(max_lat / cell_deg) + 1)
+    return [(row, lo, hi) for row in rows for lo, hi in cols]
+
+
+def grid_cell_ranges(lat, lng, radius_m, cell_deg=GRID_CELL_DEG):
+    # Cell id ranges (inclusive) covering the circle: a few per query, even
+    # at the poles and across the antimeridian
+    return [
+        (grid_cell_id(row, lo, cell_deg), grid_cell_id(row, hi, cell_deg))
+        for row, lo, hi in grid_spans(lat, lng, radius_m, cell_deg)
+    ]
+
+
+# -----------------------------
+# GEOHASH + MAP TILES
+# -----------------------------
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat, lng, precision):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_BASE32[value])
+            bits = 0
+            value = 0
+
+    return "".join(chars)
+
+
+def geohash_cell_size(precision):
+    # (height, width) in degrees of one cell
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def geohash_cover(min_lat, max_lat, min_lng, max_lng, precision):
+    # Every cell at this precision that intersects the box
+    height, width = geohash_cell_size(precision)
+    cells = set()
+
+    lat = min_lat
+    while True:
+        lng = min_lng
+        while True:
+            cells.add(geohash_encode(min(lat, max_lat), min(lng, max_lng), precision))
+            if lng >= max_lng:
+                break
+            lng += width
+        if lat >= max_lat:
+            break
+        lat += height
+
+    return sorted(cells)
+
+
+def tile_bounds(z, x, y):
+    # Web-mercator (slippy map) tile -> (min_lat, max_lat, min_lng, max_lng)
+    n = 1 << z
+
+    def lat_at(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return lat_at(y + 1), lat_at(y), x / n * 360.0 - 180.0, (x + 1) / n * 360.0 - 180.0
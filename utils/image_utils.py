@@ -1,7 +1,86 @@
-from routes.user_routes import uuid
-from werkzeug.utils import secure_filename
+import io
 import os
+import threading
+import uuid
+
+from PIL import Image, ImageOps
+from werkzeug.utils import secure_filename
+
 UPLOAD_FOLDER = os.path.join("static", "uploads")
+# Original EXIF blobs, kept out of the public static folder
+EXIF_FOLDER = os.getenv("UPLOAD_EXIF_FOLDER", "exif_store")
+
+# -----------------------------
+# INGEST CONFIG
+# -----------------------------
+IMAGE_MAX_DIM = int(os.getenv("IMAGE_MAX_DIM", "1600"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(300 * 1024)))
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg").lower()     # jpeg | webp
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_MIN_QUALITY = 50
+
+_FORMATS = {"jpeg": ("JPEG", "jpg"), "webp": ("WEBP", "webp")}
+
+_stats_lock = threading.Lock()
+ingest_stats = {
+    "images": 0,
+    "bytes_in": 0,
+    "bytes_out": 0,
+    "passthrough": 0,
+}
+
+
+def normalize_image(data, img=None):
+    # Orientation from EXIF, bounded dimensions, metadata stripped,
+    # re-encoded until it fits IMAGE_MAX_BYTES (or hits the quality floor).
+    # img: the upload already opened by the caller, if any.
+    if img is None:
+        img = Image.open(io.BytesIO(data))
+    exif = img.info.get("exif")
+
+    img = ImageOps.exif_transpose(img)
+    img.thumbnail((IMAGE_MAX_DIM, IMAGE_MAX_DIM), Image.LANCZOS)
+
+    if img.mode in ("RGBA", "LA", "P"):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.split()[-1])
+        img = background
+    elif img.mode != "RGB":
+        img = img.convert("RGB")
+
+    pil_format, ext = _FORMATS.get(IMAGE_FORMAT, _FORMATS["jpeg"])
+
+    quality = IMAGE_QUALITY
+    while True:
+        out = io.BytesIO()
+        img.save(out, pil_format, quality=quality, optimize=True)
+        encoded = out.getvalue()
+        if len(encoded) <= IMAGE_MAX_BYTES or quality <= IMAGE_MIN_QUALITY:
+            break
+        # Last pass at exactly the floor, never below it
+        quality = max(quality - 10, IMAGE_MIN_QUALITY)
+
+    return encoded, ext, exif
+
+
+def _record(bytes_in, bytes_out, passthrough=False):
+    with _stats_lock:
+        ingest_stats["images"] += 1
+        ingest_stats["bytes_in"] += bytes_in
+        ingest_stats["bytes_out"] += bytes_out
+        if passthrough:
+            ingest_stats["passthrough"] += 1
+
+
+def get_ingest_stats():
+    with _stats_lock:
+        stats = dict(ingest_stats)
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else 0.0
+    return stats
+
+
 def save_image(file):
     # Secure original filename
     original = secure_filename(file.filename)
@@ -9,17 +88,55 @@ def save_image(file):
     # Get file extension
     ext = original.rsplit(".", 1)[1].lower()
 
+    data = file.read()
+    file.stream.close()
+
+    return store_image(data, ext)
+
+
+def store_image(data, ext, img=None):
+    exif = None
+    try:
+        encoded, ext, exif = normalize_image(data, img)
+        passthrough = False
+    except Exception:
+        # Undecodable upload: keep it as-is rather than lose the complaint
+        encoded, passthrough = data, True
+
     # Generate unique filename
-    new_filename = f"{uuid.uuid4()}.{ext}"
+    name = str(uuid.uuid4())
+    new_filename = f"{name}.{ext}"
 
     # Save file
     file_path = os.path.join(UPLOAD_FOLDER, new_filename)
-    file.save(file_path)
-    file.stream.close()
+    with open(file_path, "wb") as f:
+        f.write(encoded)
+
+    # Keep the original EXIF (GPS / capture time) for later verification
+    if exif:
+        os.makedirs(EXIF_FOLDER, exist_ok=True)
+        with open(os.path.join(EXIF_FOLDER, f"{name}.exif"), "wb") as f:
+            f.write(exif)
+
+    _record(len(data), len(encoded), passthrough)
 
     return new_filename
 
 
+def remove_stored(*filenames):
+    # Undo store_image (file and EXIF sidecar) when the issue insert fails
+    for filename in filenames:
+        if not filename:
+            continue
+        name = os.path.splitext(filename)[0]
+        for path in (os.path.join(UPLOAD_FOLDER, filename),
+                     os.path.join(EXIF_FOLDER, f"{name}.exif")):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"}
 
 
@@ -27,4 +144,4 @@ def allowed_file(filename):
     return (
         "." in filename
         and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
-    )
\ No newline at end of file
+    )